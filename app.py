@@ -14,16 +14,30 @@ import re
 import base64
 
 import multiprocessing
+import hashlib
 from functools import partial
 
 from modules.data import read_last_query_time, write_last_query_time, should_query_api, get_sat_data
-from modules.propagation import propagate,spherical_to_cartesian, to_julian
-from modules.observability import get_observable_objects
+from modules.propagation import (propagate,spherical_to_cartesian, julian_range,
+                                 propagate_twobody_batch, TWOBODY_METHODS, get_third_body_ephem,
+                                 elements_to_states, screening_states, SECULAR_J2_METHOD)
+from modules.cowell_batch import cowell_batch, COWELL_METHODS
+from modules.forces import ForceModel
+from modules.parallel import sgp4_propagator_parallel
+from modules.disk_cache import trajectory_key, object_key, load_trajectory, save_trajectory, prune_cache
+from modules.incremental import find_reusable, extend_trajectories
+from modules.store import PropagationStore
+from modules.sampling import coarse_num_values
+from modules.ephemeris import ContinuousEphemeris
+from modules.chebyshev import ChebyshevEphemeris
+from modules.compact import CompactTrajectory, compact_item, transfer_item
+from modules.streaming import propagate_chunks, ephemeris_chunks, CHUNK_MINUTES
+from modules.observability import get_observable_objects, get_sun_data, stream_observable_objects
+from modules.eclipse import eclipse_timeline
 from modules.coord_frames import get_coord_sys
 from modules.layout import layout
 
 from astropy import units as u
-from astropy.coordinates import get_sun, GCRS, TEME
 
 from poliastro.bodies import Earth
 from poliastro.twobody import Orbit
@@ -36,7 +50,19 @@ from poliastro.earth.plotting.utils import EARTH_PALETTE
 color_palette=EARTH_PALETTE
 PAGE_SIZE = 10
 ITEMS_PER_PAGE = 7
-propagated_data_store = {}
+EPHEMERIS_STORAGE = 'dense' #'dense' or 'chebyshev' (compressed, trajectories rebuilt on read)
+CHEBYSHEV_TOLERANCE = 1e-3 #km
+DROPPED_FORCE_TERMS = {} #per OBJECT_TYPE, e.g. {'DEBRIS': ('srp',)}
+USE_DISK_CACHE = True
+DISK_CACHE_BUDGET_BYTES = 2 * 1024**3 #trajectories kept on disk, least recently used are deleted beyond it
+ADAPTIVE_SAMPLING = False #coarse grid from the orbital periods, refined per pair in the encounter search
+TRAJECTORY_PRECISION = 'float64' #'float32' stores anchor offsets for screening and plots, ephemerides as Chebyshev fits
+ZONAL_HARMONICS = False #adds J3..J8 to the perturbed Cowell models, degree per object from forces.ZONAL_TOLERANCE
+INCREMENTAL_PROPAGATION = True #resample earlier propagations of the same objects, propagate only the rest
+STREAMING = False #propagate and screen in windows of CHUNK_MINUTES, for horizons that do not fit in memory
+STORE_BUDGET_BYTES = 2 * 1024**3 #propagations kept in memory, least recently used are evicted beyond it
+STORE_SPILL_DIR = None #e.g. "database/propagation_store" to keep evicted propagations on disk
+propagated_data_store = PropagationStore(STORE_BUDGET_BYTES, STORE_SPILL_DIR)
 observations = []
 summary_data = []
 df = []
@@ -934,6 +960,14 @@ def update_checked_objects_store(checked, checked_all, checked_objects_store,
 
 
 
+def get_force_model(method, object_type):
+    #Terms of the method, with the higher zonal harmonics when enabled
+    terms = COWELL_METHODS[method]
+    if ZONAL_HARMONICS and 'J2' in terms:
+        terms = terms + ('zonal',)
+    return ForceModel(terms).without(*DROPPED_FORCE_TERMS.get(object_type, ()))
+
+
 @app.callback(
     Output("propagation_id", "data"),
     Input("propagate_propagate_button", 'n_clicks'),
@@ -950,7 +984,8 @@ def propagate_selected_orbits(propagate_button, checked_objects, prop_time,
     if None in [prop_time, start_date_storage, propagator_selection]:
         return None
     else:
-        propagation_id = f"{prop_time}-{start_date_storage}-{propagator_selection}"
+        selection = hashlib.sha1(json.dumps(sorted(checked_objects)).encode()).hexdigest()[:12]
+        propagation_id = f"{prop_time}-{start_date_storage}-{propagator_selection}-{selection}"
 
         if propagation_id in propagated_data_store:
             return propagation_id
@@ -960,56 +995,210 @@ def propagate_selected_orbits(propagate_button, checked_objects, prop_time,
                           format="datetime"
                     )
         end_date = start_date + timedelta(minutes=prop_time)
-        steps = int(prop_time)*10 #10 step every minute
+        checked_items = [df[df['NORAD_CAT_ID'] == sate].iloc[0].to_dict() for sate in checked_objects]
+        if ADAPTIVE_SAMPLING:
+            steps = coarse_num_values(checked_items, prop_time)
+        else:
+            steps = int(prop_time)*10 #10 step every minute
         epochs = time_range(start_date, num_values=steps, end=end_date)
         time_step = prop_time/(steps-1)*60*1000 #time step in miliseconds
 
-        jd, fr = to_julian(epochs) #this is for sgp4
-
-        sun_gcrs = get_sun(epochs)
-        # GCRS to TEME
-        sun_teme = sun_gcrs.transform_to(TEME(obstime=epochs))
-        x = sun_teme.cartesian.x
-        y = sun_teme.cartesian.y
-        z = sun_teme.cartesian.z
-
-        sun_data = {
-            'name': 'Sun',
-            'coords': np.vstack((x.to(u.km).value, 
-                                 y.to(u.km).value, 
-                                 z.to(u.km).value)).T.tolist(),
-            'epochs': [epoch.utc.iso for epoch in epochs]
-        }
+        t_grid = (epochs - start_date).to(u.s).value
+
+        if STREAMING:
+            #Only compressed ephemerides outlive each chunk, trajectories are rebuilt on read.
+            #The grid is kept as start, step and count, Sun positions are computed per chunk
+            step_seconds = prop_time*60/(steps-1)
+            t_grid = np.arange(steps) * step_seconds
+            epochs = start_date + t_grid * u.s
+            chunk_steps = max(2, int(round(CHUNK_MINUTES*60*1000/time_step)) + 1)
+            force_models = {}
+            sat_models = None
+            if propagator_selection in COWELL_METHODS:
+                for item in checked_items:
+                    object_type = item.get('OBJECT_TYPE', 'PAYLOAD')
+                    if object_type not in force_models:
+                        force_models[object_type] = get_force_model(propagator_selection, object_type)
+                sat_models = [force_models[item.get('OBJECT_TYPE', 'PAYLOAD')] for item in checked_items]
+
+            pieces = {item['NORAD_CAT_ID']: [] for item in checked_items}
+            for offset, epochs_chunk, rr, vv in propagate_chunks(checked_items, epochs, propagator_selection, 
+                                                                  chunk_steps, sat_models):
+                t_chunk = t_grid[offset:offset + len(epochs_chunk)]
+                for i, item in enumerate(checked_items):
+                    pieces[item['NORAD_CAT_ID']].append(ChebyshevEphemeris.fit(start_date, t_chunk, rr[i], vv[i], 
+                                                                               tol=CHEBYSHEV_TOLERANCE))
+
+            propagated_data_store[propagation_id] = {
+                "trajectory_data": checked_items,
+                "time_step": time_step,
+                "ephemerides": {norad_id: ChebyshevEphemeris.concatenate(fits) for norad_id, fits in pieces.items()},
+                "num_steps": steps,
+                "step_seconds": step_seconds,
+                "adaptive": ADAPTIVE_SAMPLING,
+                "streaming": True,
+                "screening": propagator_selection == SECULAR_J2_METHOD,
+                "object_keys": {item['NORAD_CAT_ID']: object_key(item, propagator_selection, 
+                                                                 sat_models[i] if sat_models else None)
+                                for i, item in enumerate(checked_items)},
+                "start_date": start_date,
+                "chunk_steps": chunk_steps,
+                "force_stats": {object_type: model.stats() for object_type, model in force_models.items()}
+            }
+
+            return propagation_id
+
+        jd, fr = julian_range(start_date, prop_time * 60 / (steps - 1), steps) #this is for sgp4
+        sun_data = get_sun_data(epochs)
 
         table_data_store_propagated = []
 
-        for sate in checked_objects:
-            item = df[df['NORAD_CAT_ID'] == sate].iloc[0].to_dict() 
-            orb_sat = Orbit.from_classical(Earth,
-                                            float(item["SEMIMAJOR_AXIS"]) * u.km,
-                                            float(item["ECCENTRICITY"]) * u.one,
-                                            float(item["INCLINATION"]) * u.deg,
-                                            float(item["RA_OF_ASC_NODE"]) * u.deg,
-                                            float(item["ARG_OF_PERICENTER"]) * u.deg,
-                                            float(item["TRUE_ANOMALY"]) * u.deg,
-                                            Time(item["EPOCH"], scale='utc')
-                                            )
-            tofs = (epochs - orb_sat.epoch).to(u.s)
-            rr, vv = propagate (orb_sat, epochs, tofs, method = propagator_selection, item=item, start_date=start_date, prop_time=prop_time, jd=jd, fr=fr)
+        #Trajectories already on disk for the same object, grid and method are memory-mapped, not propagated
+        cache_keys = {}
+        object_keys = {}
+        cached = {}
+        #One force model per object type, without the terms dropped for that type
+        force_models = {}
+        item_models = {}
+        for item in checked_items:
+            force_model = None
+            if propagator_selection in COWELL_METHODS:
+                object_type = item.get('OBJECT_TYPE', 'PAYLOAD')
+                if object_type not in force_models:
+                    force_models[object_type] = get_force_model(propagator_selection, object_type)
+                force_model = force_models[object_type]
+            item_models[item['NORAD_CAT_ID']] = force_model
+            cache_keys[item['NORAD_CAT_ID']] = trajectory_key(item, propagator_selection, epochs, force_model)
+            object_keys[item['NORAD_CAT_ID']] = object_key(item, propagator_selection, force_model)
+            states = load_trajectory(cache_keys[item['NORAD_CAT_ID']]) if USE_DISK_CACHE else None
+            if states is not None:
+                cached[item['NORAD_CAT_ID']] = states
+        pending_items = [item for item in checked_items if item['NORAD_CAT_ID'] not in cached]
+
+        #Objects of earlier propagations are resampled over the overlap, only the new head and tail are propagated
+        reused = {}
+        if INCREMENTAL_PROPAGATION and (propagator_selection in ('SGP4', SECULAR_J2_METHOD) or 
+                                        propagator_selection in TWOBODY_METHODS or 
+                                        propagator_selection in COWELL_METHODS):
+            reusable = find_reusable(propagated_data_store, 
+                                     {item['NORAD_CAT_ID']: object_keys[item['NORAD_CAT_ID']] for item in pending_items}, 
+                                     epochs)
+            reuse_items = [item for item in pending_items if item['NORAD_CAT_ID'] in reusable]
+            if reuse_items:
+                reused = extend_trajectories(reuse_items, epochs, propagator_selection, reusable,
+                                             [item_models[item['NORAD_CAT_ID']] for item in reuse_items]
+                                             if propagator_selection in COWELL_METHODS else None)
+            pending_items = [item for item in pending_items if item['NORAD_CAT_ID'] not in reused]
+
+        #SGP4 catalog objects are propagated over the shared epoch grid, sharded across the worker pool
+        sgp4_index = {}
+        if propagator_selection == 'SGP4':
+            sgp4_items = [item for item in pending_items if item['OBJECT_ID'] != 'CREATED BY USER']
+            rr_sgp4, vv_sgp4, sgp4_errors = sgp4_propagator_parallel(jd, fr, sgp4_items)
+            rr_sgp4[sgp4_errors] = np.nan
+            sgp4_index = {item['NORAD_CAT_ID']: i for i, item in enumerate(sgp4_items)}
+
+        #Initial states come straight from the catalog columns, without an Orbit per object
+        orbit_items = [item for item in pending_items if item['NORAD_CAT_ID'] not in sgp4_index]
+        r0, v0, t_epoch = elements_to_states(orbit_items, start_date)
+        orbit_index = {item['NORAD_CAT_ID']: i for i, item in enumerate(orbit_items)}
+
+        #One Moon/Sun ephemeris window shared by every object, whatever its epoch
+        t_window_start = min([0.0] + list(t_epoch))
+        ephem_window = (start_date + t_window_start * u.s, end_date)
+
+        #Keplerian, secular J2 and Cowell propagators run over every remaining object in one compiled call
+        batch_method = 'Farnocchia' if propagator_selection == 'SGP4' else propagator_selection
+        batch_index = {}
+        if (batch_method in TWOBODY_METHODS or batch_method in COWELL_METHODS or 
+            batch_method == SECULAR_J2_METHOD) and orbit_items:
+            batch_index = orbit_index
+            k = Earth.k.to(u.km**3 / u.s**2).value
+            tofs = t_grid[None, :] - t_epoch[:, None]
+            if batch_method in TWOBODY_METHODS:
+                rv_batch = propagate_twobody_batch(k, r0, v0, tofs, method=batch_method)
+            elif batch_method == SECULAR_J2_METHOD:
+                rv_batch = screening_states(orbit_items, start_date, t_grid)
+            else:
+                A_over_m = np.array([float(item['span'])**2/float(item['mass']) for item in orbit_items])
+                sat_models = [item_models[item['NORAD_CAT_ID']] for item in orbit_items]
+                ephem = None
+                if any(model.needs_ephem for model in sat_models):
+                    ephem = get_third_body_ephem(*ephem_window)
+                t_offsets = t_epoch - t_window_start
+                #Failed integrations come back as NaN trajectories
+                rv_batch, _ = cowell_batch(k, r0, v0, tofs, A_over_m=A_over_m, ephem=ephem, 
+                                           t_offsets=t_offsets, force_models=sat_models)
+
+        #Continuous ephemerides are kept server-side to resample trajectories without propagating again
+        ephemerides = {}
+        #Earth shadow of every catalog object, shared by all observers in the encounter search
+        eclipse = {}
+        sun_coords = np.array(sun_data['coords'])
+
+        for item in checked_items:
+            norad_id = item['NORAD_CAT_ID']
+            if norad_id in cached:
+                rr, vv = cached[norad_id][:, :3], cached[norad_id][:, 3:]
+                ephemerides[norad_id] = ContinuousEphemeris.from_samples(start_date, t_grid, rr, vv)
+            elif norad_id in reused:
+                rr, vv = reused[norad_id]
+                ephemerides[norad_id] = ContinuousEphemeris.from_samples(start_date, t_grid, rr, vv)
+            elif norad_id in sgp4_index:
+                rr, vv = rr_sgp4[sgp4_index[norad_id]], vv_sgp4[sgp4_index[norad_id]]
+                ephemerides[norad_id] = ContinuousEphemeris.from_samples(start_date, t_grid, rr, vv)
+            elif norad_id in batch_index:
+                rr, vv = rv_batch[batch_index[norad_id], :, :3], rv_batch[batch_index[norad_id], :, 3:]
+                ephemerides[norad_id] = ContinuousEphemeris.from_samples(start_date, t_grid, rr, vv)
+            else:
+                orb_sat = Orbit.from_classical(Earth,
+                                               float(item["SEMIMAJOR_AXIS"]) * u.km,
+                                               float(item["ECCENTRICITY"]) * u.one,
+                                               float(item["INCLINATION"]) * u.deg,
+                                               float(item["RA_OF_ASC_NODE"]) * u.deg,
+                                               float(item["ARG_OF_PERICENTER"]) * u.deg,
+                                               float(item["TRUE_ANOMALY"]) * u.deg,
+                                               Time(item["EPOCH"], scale='utc')
+                                               )
+                tofs = (epochs - orb_sat.epoch).to(u.s)
+                rr, vv, ephemerides[norad_id] = propagate (orb_sat, epochs, tofs, method = propagator_selection, item=item, 
+                                                           start_date=start_date, prop_time=prop_time, jd=jd, fr=fr, 
+                                                           ephem_window=ephem_window, return_ephem=True)
+            if USE_DISK_CACHE and norad_id not in cached:
+                save_trajectory(cache_keys[norad_id], np.hstack((rr, vv)))
             item['coords'] = rr
+            if item['OBJECT_ID'] != 'CREATED BY USER':
+                eclipse[norad_id] = eclipse_timeline(rr, sun_coords)
+            #The float32 tier keeps no float64 samples, only the Chebyshev fit of the trajectory
+            if EPHEMERIS_STORAGE == 'chebyshev' or TRAJECTORY_PRECISION == 'float32':
+                ephemerides[norad_id] = ChebyshevEphemeris.fit(start_date, t_grid, rr, vv, tol=CHEBYSHEV_TOLERANCE)
             if item ['OBJECT_ID'] == 'CREATED BY USER':
                 quater_angle = float(item['Quaternion Angle'])
                 quater_axis = ast.literal_eval(item ['Quaternion Vector'])
                 orbit_axis_sys, body_axis_sys = get_coord_sys (rr,vv,quater_angle,quater_axis)
                 item['bodyaxis'] = body_axis_sys
                 item['orbitaxis'] = orbit_axis_sys
+            elif EPHEMERIS_STORAGE == 'chebyshev':
+                del item['coords']
+            if TRAJECTORY_PRECISION == 'float32':
+                item = compact_item(item)
 
             table_data_store_propagated.append(item)
 
+        if USE_DISK_CACHE:
+            prune_cache(DISK_CACHE_BUDGET_BYTES)
+
         propagated_data_store[propagation_id] = {
             "trajectory_data": table_data_store_propagated,
             "time_step": time_step,
-            "sun_data": sun_data
+            "sun_data": sun_data,
+            "ephemerides": ephemerides,
+            "t_grid": t_grid,
+            "adaptive": ADAPTIVE_SAMPLING,
+            "object_keys": object_keys,
+            "eclipse": eclipse,
+            "screening": propagator_selection == SECULAR_J2_METHOD,
+            "force_stats": {object_type: model.stats() for object_type, model in force_models.items()}
         }
         
         return propagation_id
@@ -1027,7 +1216,10 @@ def update_visualization_sun_timestep(propagation_id):
     else:
         data = propagated_data_store[propagation_id]
         time_step = data["time_step"]
-        sun_data = data["sun_data"]        
+        if "sun_data" in data:
+            sun_data = data["sun_data"]
+        else:
+            sun_data = get_sun_data(data["start_date"] + get_time_grid(data) * u.s)
         return False, time_step, sun_data
 
 
@@ -1043,7 +1235,9 @@ def update_visualization(propagation_id, plot_propagation_button):
         return None
     
     data = propagated_data_store[propagation_id]
-    trajectory_data = data["trajectory_data"]
+    trajectory_data = get_trajectory_data(data)
+    if TRAJECTORY_PRECISION == 'float32':
+        trajectory_data = [transfer_item(item) for item in trajectory_data]
 
     return trajectory_data
 
@@ -1063,10 +1257,39 @@ app.clientside_callback(
 )
     
 
-def process_created_sat(created_data, ephem_catalog_sat_data, sun_data):
+def get_time_grid(data):
+    #Streaming entries keep only the start, step and count of their grid
+    if "t_grid" in data:
+        return data["t_grid"]
+    return np.arange(data["num_steps"]) * data["step_seconds"]
+
+
+def get_trajectory_data(data):
+    #Compressed entries keep no coordinates, they are evaluated again on the propagation grid
+    trajectory_data = []
+    for item in data["trajectory_data"]:
+        if 'coords' not in item:
+            item = dict(item)
+            item['coords'], vv = data["ephemerides"][item['NORAD_CAT_ID']].sample(get_time_grid(data))
+            if item['OBJECT_ID'] == 'CREATED BY USER' and 'bodyaxis' not in item:
+                item['orbitaxis'], item['bodyaxis'] = get_coord_sys(item['coords'], vv, 
+                                                                    float(item['Quaternion Angle']),
+                                                                    ast.literal_eval(item['Quaternion Vector']))
+        elif isinstance(item['coords'], CompactTrajectory):
+            item = dict(item, coords=item['coords'].decode())
+        trajectory_data.append(item)
+    return trajectory_data
+
+
+def process_created_sat(created_data, ephem_catalog_sat_data, sun_data, ephemerides=None, adaptive=False, 
+                        eclipse=None, screening=False):
     observation_from_created_sat, num_observations = get_observable_objects(created_data, 
                                                                             ephem_catalog_sat_data, 
-                                                                            sun_data)
+                                                                            sun_data,
+                                                                            ephemerides,
+                                                                            adaptive,
+                                                                            eclipse,
+                                                                            screening)
     summary = {
         "OBJECT_NAME": created_data['OBJECT_NAME'],
         "Number of Observations": num_observations,
@@ -1090,7 +1313,21 @@ def update_encounters_tab(propagation_id, summary_table_trigger):
     global propagated_data_store, observations, summary_data
     
     data = propagated_data_store[propagation_id]
-    trajectory_data = data["trajectory_data"]
+    if data.get("streaming"):
+        #Chunks are resampled from the stored ephemerides and screened one at a time
+        items = data["trajectory_data"]
+        epochs = data["start_date"] + get_time_grid(data) * u.s
+        chunks = ephemeris_chunks(data["ephemerides"], [item['NORAD_CAT_ID'] for item in items], epochs, 
+                                  data["chunk_steps"])
+        with multiprocessing.Pool() as pool:
+            summary_data, observations = stream_observable_objects(chunks, items, pool.map, 
+                                                                   screening=data.get("screening", False),
+                                                                   adaptive=data.get("adaptive", False))
+        summary_data.sort(key=lambda x: x["Number of Observations"], reverse=True)
+        summary_table_trigger =+1
+        return summary_table_trigger
+
+    trajectory_data = get_trajectory_data(data)
     sun_data = data["sun_data"]
 
     ephem_created_sat_data = []
@@ -1102,7 +1339,9 @@ def update_encounters_tab(propagation_id, summary_table_trigger):
             ephem_catalog_sat_data.append(item)
 
 
-    process_func = partial(process_created_sat, ephem_catalog_sat_data=ephem_catalog_sat_data, sun_data=sun_data)
+    process_func = partial(process_created_sat, ephem_catalog_sat_data=ephem_catalog_sat_data, sun_data=sun_data,
+                           ephemerides=data.get("ephemerides"), adaptive=data.get("adaptive", False),
+                           eclipse=data.get("eclipse"), screening=data.get("screening", False))
 
     with multiprocessing.Pool() as pool:
         results = pool.map(process_func, ephem_created_sat_data)
@@ -1344,51 +1583,52 @@ def update_data_for_simulation(simulation_clicks, simulation_id, propagation_id,
                     steps = 30*1000+1
                     epochs_sim = time_range(start_time, num_values=steps, end=end_time)
                     time_step = prop_time_sim/(steps-1)*60*1000 
-                    jd, fr = to_julian(epochs_sim)
-
-                    sun_gcrs_sim = get_sun(epochs_sim)
-                    # GCRS to TEME
-                    sun_teme_sim = sun_gcrs_sim.transform_to(TEME(obstime=epochs_sim))
-                    x_sim = sun_teme_sim.cartesian.x
-                    y_sim = sun_teme_sim.cartesian.y
-                    z_sim = sun_teme_sim.cartesian.z
-
-                    sun_data_sim = {
-                        'name': 'Sun',
-                        'coords': np.vstack((x_sim.to(u.km).value, 
-                                            y_sim.to(u.km).value, 
-                                            z_sim.to(u.km).value)).T.tolist(),
-                        'epochs': [epoch_sim.utc.iso for epoch_sim in epochs_sim]
-                    }
+
+                    sun_data_sim = get_sun_data(epochs_sim)
 
                     item_observed = df[df['NORAD_CAT_ID'] == observed_norad_id].iloc[0].to_dict() 
                     item_observant = df[df['NORAD_CAT_ID'] == observant_norad_id].iloc[0].to_dict() 
-                    orb_sat_observed = Orbit.from_classical(Earth,
-                                                            float(item_observed["SEMIMAJOR_AXIS"]) * u.km,
-                                                            float(item_observed["ECCENTRICITY"]) * u.one,
-                                                            float(item_observed["INCLINATION"]) * u.deg,
-                                                            float(item_observed["RA_OF_ASC_NODE"]) * u.deg,
-                                                            float(item_observed["ARG_OF_PERICENTER"]) * u.deg,
-                                                            float(item_observed["TRUE_ANOMALY"]) * u.deg,
-                                                            Time(item_observed["EPOCH"], scale='utc')
-                                                            )
-                    orb_sat_observant = Orbit.from_classical(Earth,
-                                                            float(item_observant["SEMIMAJOR_AXIS"]) * u.km,
-                                                            float(item_observant["ECCENTRICITY"]) * u.one,
-                                                            float(item_observant["INCLINATION"]) * u.deg,
-                                                            float(item_observant["RA_OF_ASC_NODE"]) * u.deg,
-                                                            float(item_observant["ARG_OF_PERICENTER"]) * u.deg,
-                                                            float(item_observant["TRUE_ANOMALY"]) * u.deg,
-                                                            Time(item_observant["EPOCH"], scale='utc')
-                                                            )
-                    tofs_observed = (epochs_sim - orb_sat_observed.epoch).to(u.s)
-                    tofs_obsevant = (epochs_sim - orb_sat_observant.epoch).to(u.s)
-                    rr_observed, vv_observed = propagate (orb_sat_observed,epochs_sim,tofs_observed, 
-                                                          method=propagator_selection, item=item_observed, 
-                                                          start_date=start_time, prop_time=prop_time_sim, jd=jd, fr=fr)
-                    rr_observant, vv_observant = propagate (orb_sat_observant,epochs_sim,tofs_obsevant, 
-                                                            method='Farnocchia', item=item_observant,
-                                                            start_date=start_time, prop_time=prop_time_sim, jd=jd, fr=fr)
+
+                    #Sample the stored continuous ephemerides instead of propagating again,
+                    #screening ephemerides are not accurate enough for the replay
+                    data = propagated_data_store.get(propagation_id, {})
+                    ephemerides = {} if data.get("screening") else data.get("ephemerides", {})
+                    ephem_observed = ephemerides.get(observed_norad_id)
+                    ephem_observant = ephemerides.get(observant_norad_id)
+                    if (ephem_observed is not None and ephem_observant is not None and
+                        ephem_observed.covers(epochs_sim) and ephem_observant.covers(epochs_sim)):
+                        rr_observed, vv_observed = ephem_observed.sample_epochs(epochs_sim)
+                        rr_observant, vv_observant = ephem_observant.sample_epochs(epochs_sim)
+                    else:
+                        orb_sat_observed = Orbit.from_classical(Earth,
+                                                                float(item_observed["SEMIMAJOR_AXIS"]) * u.km,
+                                                                float(item_observed["ECCENTRICITY"]) * u.one,
+                                                                float(item_observed["INCLINATION"]) * u.deg,
+                                                                float(item_observed["RA_OF_ASC_NODE"]) * u.deg,
+                                                                float(item_observed["ARG_OF_PERICENTER"]) * u.deg,
+                                                                float(item_observed["TRUE_ANOMALY"]) * u.deg,
+                                                                Time(item_observed["EPOCH"], scale='utc')
+                                                                )
+                        orb_sat_observant = Orbit.from_classical(Earth,
+                                                                float(item_observant["SEMIMAJOR_AXIS"]) * u.km,
+                                                                float(item_observant["ECCENTRICITY"]) * u.one,
+                                                                float(item_observant["INCLINATION"]) * u.deg,
+                                                                float(item_observant["RA_OF_ASC_NODE"]) * u.deg,
+                                                                float(item_observant["ARG_OF_PERICENTER"]) * u.deg,
+                                                                float(item_observant["TRUE_ANOMALY"]) * u.deg,
+                                                                Time(item_observant["EPOCH"], scale='utc')
+                                                                )
+                        jd, fr = julian_range(start_time, (end_time - start_time).to(u.s) / (steps - 1), steps)
+                        tofs_observed = (epochs_sim - orb_sat_observed.epoch).to(u.s)
+                        tofs_obsevant = (epochs_sim - orb_sat_observant.epoch).to(u.s)
+                        method_observed = 'SGP4' if propagator_selection == SECULAR_J2_METHOD else propagator_selection
+                        rr_observed, vv_observed = propagate (orb_sat_observed,epochs_sim,tofs_observed, 
+                                                              method=method_observed, item=item_observed, 
+                                                              start_date=start_time, prop_time=prop_time_sim, jd=jd, fr=fr)
+                        rr_observant, vv_observant = propagate (orb_sat_observant,epochs_sim,tofs_obsevant, 
+                                                                method='Farnocchia', item=item_observant,
+                                                                start_date=start_time, prop_time=prop_time_sim, jd=jd, fr=fr)
+
                     item_observed['coords'] = rr_observed
                     item_observant['coords'] = rr_observant
                     quater_angle_sim = float(item_observant['Quaternion Angle'])
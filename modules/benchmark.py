@@ -0,0 +1,248 @@
+"""Speed and accuracy benchmark of every propagator exposed by `propagate`.
+
+Run from the repository root, e.g.
+
+    python -m modules.benchmark --sizes 10 100 --horizons 100 1440 --output benchmark.json
+
+Every method propagates synthetic LEO catalogs over several horizons, on the
+same grid as the app (10 steps per minute). Each run reports wall time,
+objects x steps per second, peak traced memory and the position error
+against a reference: DOP853 at rtol=1e-13 with the same force model for the
+Keplerian and Cowell methods (SGP4 has no reference and reports null). The
+Keplerian methods are also checked against the GMAT report simulation_ECI.txt.
+
+"""
+import argparse
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+
+from astropy import units as u
+from astropy.time import Time
+from poliastro.bodies import Earth
+from poliastro.twobody import Orbit
+from poliastro.util import time_range
+from poliastro.core.angles import nu_to_E, E_to_M
+
+import numpy as np
+
+from sgp4.api import Satrec, WGS72
+from sgp4.exporter import export_tle
+
+from modules.propagation import (propagate,
+                                 propagate_twobody_batch,
+                                 sgp4_propagator_batch,
+                                 cowell,
+                                 cowell_w_s_pert,
+                                 cowell_w_pert,
+                                 julian_range,
+                                 get_third_body_ephem,
+                                 TWOBODY_METHODS
+                                 )
+from modules.cowell_batch import cowell_batch, COWELL_METHODS
+
+
+METHODS = list(TWOBODY_METHODS) + list(COWELL_METHODS) + ['SGP4']
+BENCHMARK_EPOCH = "2024-09-09T10:00:00"
+STEPS_PER_MINUTE = 10
+REFERENCE_RTOL = 1e-13
+
+#GMAT two-body run of STARLINK-30104, see tests.ipynb
+GMAT_REPORT = "simulation_ECI.txt"
+GMAT_EPOCH = "2024-09-05T13:17:21.016608"
+
+
+def synthetic_catalog(n, epoch=BENCHMARK_EPOCH, seed=0):
+    """Random LEO objects with the fields `propagate` needs, TLEs included."""
+    rng = np.random.default_rng(seed)
+    epoch = Time(epoch, scale='utc')
+    items = []
+    for i in range(n):
+        a = Earth.R.to(u.km).value + rng.uniform(400, 1000)
+        ecc = rng.uniform(1e-4, 1e-2)
+        inc, raan, argp, nu = np.radians(rng.uniform([40, 0, 0, 0], [100, 360, 360, 360]))
+
+        #Mean elements of a TLE on the same orbit, for SGP4
+        satrec = Satrec()
+        satrec.sgp4init(WGS72, 'i', 90000 + i, epoch.jd - 2433281.5, 0.0, 0.0, 0.0, ecc, argp, inc,
+                        E_to_M(nu_to_E(nu, ecc), ecc) % (2 * np.pi),
+                        np.sqrt(Earth.k.to(u.km**3 / u.s**2).value / a**3) * 60, raan)
+        line1, line2 = export_tle(satrec)
+
+        items.append({
+            "OBJECT_NAME": f"Benchmark-{i}",
+            "OBJECT_ID": "BENCHMARK",
+            "NORAD_CAT_ID": 90000 + i,
+            "EPOCH": epoch.isot,
+            "SEMIMAJOR_AXIS": a,
+            "ECCENTRICITY": ecc,
+            "INCLINATION": np.degrees(inc),
+            "RA_OF_ASC_NODE": np.degrees(raan),
+            "ARG_OF_PERICENTER": np.degrees(argp),
+            "TRUE_ANOMALY": np.degrees(nu),
+            "TLE_LINE1": line1,
+            "TLE_LINE2": line2,
+            "span": rng.uniform(0.1, 2) / 1000,
+            "mass": rng.uniform(10, 1000),
+        })
+    return items
+
+
+def item_orbit(item):
+    return Orbit.from_classical(Earth,
+                                item["SEMIMAJOR_AXIS"] * u.km,
+                                item["ECCENTRICITY"] * u.one,
+                                item["INCLINATION"] * u.deg,
+                                item["RA_OF_ASC_NODE"] * u.deg,
+                                item["ARG_OF_PERICENTER"] * u.deg,
+                                item["TRUE_ANOMALY"] * u.deg,
+                                Time(item["EPOCH"], scale='utc')
+                                )
+
+
+def reference_positions(method, orbit, item, tofs, start_date, prop_time):
+    """Positions (km) of a tight DOP853 integration with the force model of `method`."""
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    r0 = orbit.r.to(u.km).value
+    v0 = orbit.v.to(u.km / u.s).value
+
+    if method in TWOBODY_METHODS or method == 'Cowell (wo/perturbations)':
+        rr, _ = cowell(k, r0, v0, tofs, "DOP853", rtol=REFERENCE_RTOL)
+    elif method == 'Cowell (w/ some perturbations)':
+        rr, _ = cowell_w_s_pert(k, r0, v0, tofs, "DOP853", item['span'], item['mass'], rtol=REFERENCE_RTOL)
+    elif method == 'Cowell (w/ perturbations)':
+        rr, _ = cowell_w_pert(k, r0, v0, tofs, "DOP853", orbit, item['span'], item['mass'], start_date, prop_time,
+                              rtol=REFERENCE_RTOL)
+    else:
+        return None
+    return rr
+
+
+def run_propagate(method, items, orbits, epochs, tofs, start_date, prop_time, jd, fr):
+    """Propagate every object one by one through `propagate`, as the app fallback does."""
+    return np.array([propagate(orbit, epochs, tofs, method=method, item=item, start_date=start_date,
+                               prop_time=prop_time, jd=jd, fr=fr)[0]
+                     for item, orbit in zip(items, orbits)])
+
+
+def run_batch(method, items, orbits, epochs, tofs, start_date, prop_time, jd, fr):
+    """Propagate every object in one call of the compiled batch kernels."""
+    if method == 'SGP4':
+        return sgp4_propagator_batch(jd, fr, items)[0]
+
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    r0 = np.array([orbit.r.to(u.km).value for orbit in orbits])
+    v0 = np.array([orbit.v.to(u.km / u.s).value for orbit in orbits])
+    if method in TWOBODY_METHODS:
+        return propagate_twobody_batch(k, r0, v0, tofs, method=method)[:, :, :3]
+
+    A_over_m = np.array([item['span']**2 / item['mass'] for item in items])
+    ephem = None
+    if method == 'Cowell (w/ perturbations)':
+        ephem = get_third_body_ephem(start_date, start_date + prop_time * u.min)
+    return cowell_batch(k, r0, v0, tofs, method=method, A_over_m=A_over_m, ephem=ephem)[0][:, :, :3]
+
+
+def measure(runner, *args):
+    """Return the output, wall time (s) and peak traced memory (MB) of one call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    rr = runner(*args)
+    wall_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rr, wall_time, peak / 1e6
+
+
+def benchmark(methods=METHODS, sizes=(10, 100), horizons=(100, 1440), modes=('propagate', 'batch'), seed=0):
+    runners = {'propagate': run_propagate, 'batch': run_batch}
+    results = []
+
+    for prop_time in horizons:
+        start_date = Time(BENCHMARK_EPOCH, scale='utc')
+        steps = int(prop_time) * STEPS_PER_MINUTE
+        epochs = time_range(start_date, num_values=steps, end=start_date + prop_time * u.min)
+        tofs = (epochs - start_date).to(u.s).value
+        jd, fr = julian_range(start_date, prop_time * 60 / (steps - 1), steps)
+
+        for n in sizes:
+            items = synthetic_catalog(n, seed=seed)
+            orbits = [item_orbit(item) for item in items]
+
+            for method in methods:
+                references = [reference_positions(method, orbit, item, tofs, start_date, prop_time)
+                              for item, orbit in zip(items, orbits)]
+
+                for mode in modes:
+                    args = (method, items, orbits, epochs, tofs, start_date, prop_time, jd, fr)
+                    #First call compiles the numba kernels, it is not timed
+                    runners[mode](method, items[:1], orbits[:1], *args[3:])
+                    rr, wall_time, peak_memory = measure(runners[mode], *args)
+
+                    error = None
+                    if references[0] is not None:
+                        error = float(np.nanmax(np.linalg.norm(rr - np.array(references), axis=-1)))
+
+                    results.append({
+                        "method": method,
+                        "mode": mode,
+                        "n_objects": n,
+                        "horizon_min": prop_time,
+                        "n_steps": steps,
+                        "wall_time_s": wall_time,
+                        "object_steps_per_s": n * steps / wall_time,
+                        "peak_memory_mb": peak_memory,
+                        "max_position_error_km": error,
+                    })
+                    print(f"{method:32} {mode:10} n={n:<6} {prop_time:>6} min  {wall_time:9.3f} s  "
+                          f"error={error}")
+
+    return results
+
+
+def gmat_comparison(methods=TWOBODY_METHODS, report=GMAT_REPORT):
+    """Maximum position error (km) of the two-body methods against the GMAT report."""
+    data = np.loadtxt(report, skiprows=1)
+    tofs, a, nu, raan, ecc, inc, argp = data.T
+    epoch = Time(GMAT_EPOCH, scale='utc')
+
+    reference = np.array([Orbit.from_classical(Earth, a[i] * u.km, ecc[i] * u.one, inc[i] * u.deg,
+                                               raan[i] * u.deg, argp[i] * u.deg, nu[i] * u.deg,
+                                               epoch).r.to(u.km).value
+                          for i in range(len(tofs))])
+    orbit = Orbit.from_classical(Earth, a[0] * u.km, ecc[0] * u.one, inc[0] * u.deg, raan[0] * u.deg,
+                                 argp[0] * u.deg, nu[0] * u.deg, epoch)
+    epochs = epoch + tofs * u.s
+
+    return {method: float(np.linalg.norm(propagate(orbit, epochs, tofs, method=method)[0] - reference,
+                                         axis=-1).max())
+            for method in methods}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the propagators")
+    parser.add_argument("--methods", nargs="+", default=METHODS, choices=METHODS)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100])
+    parser.add_argument("--horizons", nargs="+", type=float, default=[100, 1440],
+                        help="propagation times in minutes")
+    parser.add_argument("--modes", nargs="+", default=['propagate', 'batch'], choices=['propagate', 'batch'])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    report = {
+        "date": datetime.utcnow().isoformat(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "results": benchmark(args.methods, args.sizes, args.horizons, args.modes, args.seed),
+        "gmat_max_position_error_km": gmat_comparison([m for m in args.methods if m in TWOBODY_METHODS]),
+    }
+
+    with open(args.output, 'w') as json_file:
+        json.dump(report, json_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
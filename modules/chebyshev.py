@@ -0,0 +1,151 @@
+from astropy import units as u
+from astropy.time import Time
+
+import numpy as np
+from numpy.polynomial import chebyshev
+
+from modules.ephemeris import COVER_TOLERANCE
+
+
+def _clenshaw(coeffs, x):
+    """Evaluate Chebyshev series with the Clenshaw recurrence.
+
+    Parameters
+    ----------
+    coeffs : numpy.ndarray
+        Coefficients of every evaluation point, shape (N, n, 3).
+    x : numpy.ndarray
+        Normalized times in [-1, 1], shape (N,).
+
+    """
+    x = x[:, None]
+    b1 = np.zeros((coeffs.shape[0], coeffs.shape[2]))
+    b2 = np.zeros_like(b1)
+    for k in range(coeffs.shape[1] - 1, 0, -1):
+        b1, b2 = coeffs[:, k] + 2 * x * b1 - b2, b1
+    return coeffs[:, 0] + x * b1 - b2
+
+
+def _fit_segment(t, rr, vv, t_start, t_end, degree):
+    """Least-squares fit of positions (and velocities) over one segment."""
+    half = (t_end - t_start) / 2
+    x = (t - t_start) / half - 1
+    n_coeffs = min(degree + 1, len(t) if vv is None else 2 * len(t))
+
+    A = chebyshev.chebvander(x, n_coeffs - 1)
+    b = rr
+    if vv is not None:
+        #Velocity rows use the derivative of the series, scaled to km
+        A_v = chebyshev.chebvander(x, n_coeffs - 2) @ chebyshev.chebder(np.eye(n_coeffs))
+        A = np.vstack((A, A_v))
+        b = np.vstack((rr, vv * half))
+
+    coeffs = np.zeros((degree + 1, 3))
+    coeffs[:n_coeffs] = np.linalg.lstsq(A, b, rcond=None)[0]
+    residual = np.abs(chebyshev.chebval(x, coeffs[:n_coeffs]).T - rr).max()
+
+    return coeffs, residual
+
+
+class ChebyshevEphemeris:
+    """Piecewise Chebyshev compression of a trajectory.
+
+    Every segment holds `degree + 1` coefficients per axis, fitted so that the
+    position error at the input samples stays below `tol` (km); segments are
+    halved until they do, down to two samples that the fit interpolates.
+    Failed (non-finite) samples are not fitted: from halfway to the previous
+    finite sample up to the next finite one the ephemeris evaluates to NaN.
+    Times are seconds since `epoch`, and the interface matches
+    ephemeris.ContinuousEphemeris.
+
+    """
+
+    def __init__(self, epoch, boundaries, coeffs):
+        self.epoch = Time(epoch)
+        self.boundaries = np.asarray(boundaries, dtype=float)
+        self.coeffs = np.asarray(coeffs, dtype=float)
+
+    @classmethod
+    def fit(cls, epoch, t, rr, vv=None, tol=1e-3, degree=12, segment_length=3600):
+        """Compress samples `rr` (km) and optionally `vv` (km/s) at `t` seconds since `epoch`."""
+        t = np.asarray(t, dtype=float)
+        rr = np.asarray(rr, dtype=float)
+        vv = None if vv is None else np.asarray(vv, dtype=float)
+
+        finite = np.isfinite(rr).all(axis=1)
+        if vv is not None:
+            finite &= np.isfinite(vv).all(axis=1)
+
+        #Runs of finite samples are fitted on their own, the gaps between them hold NaN coefficients
+        index = np.flatnonzero(finite)
+        runs = np.split(index, np.flatnonzero(np.diff(index) > 1) + 1) if len(index) > 0 else []
+        gap = np.full((degree + 1, 3), np.nan)
+        segments = []
+        pending = []
+        t_gap = t[0]
+        for run in runs:
+            if run[0] > 0:
+                segments.append((t_gap, t[run[0]], gap))
+            t_run_end = t[run[-1]] if run[-1] == len(t) - 1 else (t[run[-1]] + t[run[-1] + 1]) / 2
+            n_initial = max(1, int(np.ceil((t_run_end - t[run[0]]) / segment_length)))
+            edges = np.linspace(t[run[0]], t_run_end, n_initial + 1)
+            pending.extend(zip(edges[:-1], edges[1:]))
+            t_gap = t_run_end
+        if len(runs) == 0 or runs[-1][-1] < len(t) - 1:
+            segments.append((t_gap, t[-1], gap))
+
+        while pending:
+            t_start, t_end = pending.pop()
+            mask = finite & (t >= t_start) & (t <= t_end)
+            coeffs, residual = _fit_segment(t[mask], rr[mask], None if vv is None else vv[mask],
+                                            t_start, t_end, degree)
+            if residual > tol and mask.sum() > 2:
+                t_mid = t[mask][mask.sum() // 2]
+                pending.extend([(t_start, t_mid), (t_mid, t_end)])
+            else:
+                segments.append((t_start, t_end, coeffs))
+
+        segments.sort(key=lambda segment: segment[0])
+        boundaries = [segment[0] for segment in segments] + [segments[-1][1]]
+        return cls(epoch, boundaries, np.array([segment[2] for segment in segments]))
+
+    @classmethod
+    def concatenate(cls, pieces):
+        """Join fits of consecutive windows sharing their boundary times, e.g. one per chunk."""
+        boundaries = [pieces[0].boundaries] + [piece.boundaries[1:] for piece in pieces[1:]]
+        return cls(pieces[0].epoch, np.concatenate(boundaries), np.concatenate([piece.coeffs for piece in pieces]))
+
+    @property
+    def t_min(self):
+        return self.boundaries[0]
+
+    @property
+    def t_max(self):
+        return self.boundaries[-1]
+
+    @property
+    def nbytes(self):
+        return self.boundaries.nbytes + self.coeffs.nbytes
+
+    def tofs(self, epochs):
+        return (Time(epochs) - self.epoch).to(u.s).value
+
+    def covers(self, epochs):
+        tofs = np.atleast_1d(self.tofs(epochs))
+        return bool(tofs.min() >= self.t_min - COVER_TOLERANCE and tofs.max() <= self.t_max + COVER_TOLERANCE)
+
+    def sample(self, tofs):
+        """Return positions (km) and velocities (km/s) at `tofs` seconds since the epoch."""
+        tofs = np.atleast_1d(np.asarray(tofs, dtype=float))
+        i = np.clip(np.searchsorted(self.boundaries, tofs, side='right') - 1,
+                    0, len(self.boundaries) - 2)
+        half = (self.boundaries[i + 1] - self.boundaries[i]) / 2
+        x = (tofs - self.boundaries[i]) / half - 1
+
+        rr = _clenshaw(self.coeffs[i], x)
+        vv = _clenshaw(chebyshev.chebder(self.coeffs, axis=1)[i], x) / half[:, None]
+
+        return rr, vv
+
+    def sample_epochs(self, epochs):
+        return self.sample(self.tofs(epochs))
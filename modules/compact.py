@@ -0,0 +1,86 @@
+import numpy as np
+
+
+### FLOAT32 TRAJECTORY STORAGE ###
+#Positions are kept as float32 offsets from a float64 anchor sample per block.
+#Rounding an offset o to float32 moves each component by at most 2**-24 |o_i|,
+#and adding it back to the anchor a in float64 costs 2**-52 (|a| + |o|) at most,
+#so a decoded position is off by at most 2**-24 |o| + 2**-52 (|a| + |o|) km. With LEO
+#velocities and the 6 s grid of the app a block of 64 samples spans about
+#3000 km, which bounds the error below 0.2 m at half the memory of float64
+ANCHOR_BLOCK = 64 #samples per anchor
+TRANSFER_DECIMALS = 3 #km, positions rounded for the browser
+AXIS_DECIMALS = 6 #unit vectors rounded for the browser
+
+
+class CompactTrajectory:
+    """Float32 positions relative to float64 anchors, for screening and visualization.
+
+    Refinement and closest approach timing resample the Chebyshev fit kept
+    with the propagation and never read these positions.
+
+    """
+
+    def __init__(self, anchors, offsets, block=ANCHOR_BLOCK):
+        self.anchors = np.asarray(anchors, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.float32)
+        self.block = block
+        #Worst case over the samples of the bound in the module comment (km)
+        offset_norms = np.linalg.norm(self.offsets.astype(np.float64), axis=1)
+        anchor_norms = np.repeat(np.linalg.norm(self.anchors, axis=1), block)[:len(offset_norms)]
+        #Failed SGP4 samples are NaN and carry no bound
+        self.error_bound = float(np.fmax.reduce(2.0**-24 * offset_norms + 2.0**-52 * (anchor_norms + offset_norms),
+                                                initial=0.0))
+
+    @classmethod
+    def encode(cls, rr, block=ANCHOR_BLOCK):
+        """Compact (N, 3) positions (km); each anchor is the middle sample of its block."""
+        rr = np.asarray(rr, dtype=np.float64)
+        starts = np.arange(0, len(rr), block)
+        anchors = rr[np.minimum(starts + block // 2, len(rr) - 1)].copy()
+        #A failed (NaN) middle sample would spoil its whole block, any finite sample of the block will do
+        for i in np.flatnonzero(~np.isfinite(anchors).all(axis=1)):
+            finite = rr[starts[i]:starts[i] + block][np.isfinite(rr[starts[i]:starts[i] + block]).all(axis=1)]
+            anchors[i] = finite[len(finite) // 2] if len(finite) else 0.0
+        offsets = rr - np.repeat(anchors, block, axis=0)[:len(rr)]
+        return cls(anchors, offsets, block)
+
+    def decode(self):
+        """Positions (km) as a float64 (N, 3) array."""
+        return np.repeat(self.anchors, self.block, axis=0)[:len(self.offsets)] + self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __array__(self, dtype=None, copy=None):
+        rr = self.decode()
+        return rr if dtype is None else rr.astype(dtype)
+
+    @property
+    def nbytes(self):
+        return self.anchors.nbytes + self.offsets.nbytes
+
+
+def compact_item(item):
+    """Copy of a propagated item with float32 coordinates and camera axes."""
+    item = dict(item)
+    if 'coords' in item:
+        item['coords'] = CompactTrajectory.encode(item['coords'])
+    for key in ('bodyaxis', 'orbitaxis'):
+        if key in item:
+            item[key] = np.asarray(item[key], dtype=np.float32)
+    return item
+
+
+def transfer_item(item):
+    """Copy of an item with positions and axes rounded to the float32 resolution, for dcc.Store.
+
+    Rounded values serialize to about half the JSON characters of float64 values.
+
+    """
+    item = dict(item)
+    item['coords'] = np.round(np.asarray(item['coords'], dtype=np.float64), TRANSFER_DECIMALS)
+    for key in ('bodyaxis', 'orbitaxis'):
+        if key in item:
+            item[key] = np.round(np.asarray(item[key], dtype=np.float64), AXIS_DECIMALS)
+    return item
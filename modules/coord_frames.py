@@ -1,43 +1,75 @@
 import numpy as np
-import quaternion
-
-def get_coord_sys (rr,vv, angle_quat, axis_quat): 
-    angle = np.radians(angle_quat)
-    axis_orb = axis_quat/np.linalg.norm(axis_quat)
-
-    z_axis_orb_coord = np.array([-coord/np.linalg.norm(coord) for coord in rr])
-    y_axis_orb_coord = -np.cross(rr[1], vv[1])/np.linalg.norm(np.cross(rr[1], vv[1]))
-    x_axis_orb_coord = [np.cross(y_axis_orb_coord,z_axis_orb_coord_step) for 
-                        z_axis_orb_coord_step in z_axis_orb_coord]
-    orbit_axis_sys = []
-    for i, z in enumerate(z_axis_orb_coord):
-        orbit_frame_step = [x_axis_orb_coord[i], y_axis_orb_coord, z]
-        orbit_axis_sys.append(orbit_frame_step)
-
-    #COMPUTATION OF THE BODY FRAME
-    body_axis_sys = []
-    for orbit_frame_step in orbit_axis_sys:
-        x_orb = orbit_frame_step[0]
-        y_orb = orbit_frame_step[1]
-        z_orb = orbit_frame_step[2]
-        R_ECEF_orb= np.array([x_orb.T, y_orb.T, z_orb.T])
-        R_orb_ECEF = R_ECEF_orb.T
-        axis_ECEF = np.dot (R_orb_ECEF, axis_orb)
-        q = quaternion.from_rotation_vector(angle * axis_ECEF)
-
-        p_x = np.quaternion(0,x_orb[0],x_orb[1],x_orb[2]) 
-        rotated_p_x = q * p_x * q.conjugate()
-        x_body = rotated_p_x.vec/np.linalg.norm(rotated_p_x.vec)
-
-        p_y = np.quaternion(0,y_orb[0],y_orb[1],y_orb[2]) 
-        rotated_p_y = q * p_y * q.conjugate()
-        y_body = rotated_p_y.vec/np.linalg.norm(rotated_p_y.vec)
-
-        p_z = np.quaternion(0,z_orb[0],z_orb[1],z_orb[2])
-        rotated_p_z = q * p_z * q.conjugate()
-        z_body = rotated_p_z.vec/np.linalg.norm(rotated_p_z.vec)
-        
-        body_system_step = [x_body, y_body, z_body]
-        body_axis_sys.append(body_system_step)    
-
-    return orbit_axis_sys, body_axis_sys
\ No newline at end of file
+from numba import njit as jit
+from numba import prange
+
+@jit(parallel=True)
+def _coord_sys_batch(rr, y_axis, axis_orb, angle, orbit_axis_sys, body_axis_sys):
+    for n in prange(rr.shape[0]):
+        r_norm = np.sqrt(rr[n, 0]**2 + rr[n, 1]**2 + rr[n, 2]**2)
+        for i in range(3):
+            orbit_axis_sys[n, 1, i] = y_axis[i]
+            orbit_axis_sys[n, 2, i] = -rr[n, i] / r_norm
+        orbit_axis_sys[n, 0, 0] = y_axis[1] * orbit_axis_sys[n, 2, 2] - y_axis[2] * orbit_axis_sys[n, 2, 1]
+        orbit_axis_sys[n, 0, 1] = y_axis[2] * orbit_axis_sys[n, 2, 0] - y_axis[0] * orbit_axis_sys[n, 2, 2]
+        orbit_axis_sys[n, 0, 2] = y_axis[0] * orbit_axis_sys[n, 2, 1] - y_axis[1] * orbit_axis_sys[n, 2, 0]
+
+        #Rotation vector in ECI, angle * R_orb_ECEF . axis_orb, as the quaternion of the step
+        w0 = angle * (orbit_axis_sys[n, 0, 0] * axis_orb[0] + orbit_axis_sys[n, 1, 0] * axis_orb[1] +
+                      orbit_axis_sys[n, 2, 0] * axis_orb[2])
+        w1 = angle * (orbit_axis_sys[n, 0, 1] * axis_orb[0] + orbit_axis_sys[n, 1, 1] * axis_orb[1] +
+                      orbit_axis_sys[n, 2, 1] * axis_orb[2])
+        w2 = angle * (orbit_axis_sys[n, 0, 2] * axis_orb[0] + orbit_axis_sys[n, 1, 2] * axis_orb[1] +
+                      orbit_axis_sys[n, 2, 2] * axis_orb[2])
+        theta = np.sqrt(w0**2 + w1**2 + w2**2)
+        k0, k1, k2 = 0.0, 0.0, 0.0
+        if theta > 0:
+            k0, k1, k2 = w0 / theta, w1 / theta, w2 / theta
+        cos_t, sin_t = np.cos(theta), np.sin(theta)
+
+        #Rodrigues rotation of every orbit axis, then normalized
+        for j in range(3):
+            v0, v1, v2 = orbit_axis_sys[n, j, 0], orbit_axis_sys[n, j, 1], orbit_axis_sys[n, j, 2]
+            k_dot_v = (k0 * v0 + k1 * v1 + k2 * v2) * (1 - cos_t)
+            b0 = v0 * cos_t + (k1 * v2 - k2 * v1) * sin_t + k0 * k_dot_v
+            b1 = v1 * cos_t + (k2 * v0 - k0 * v2) * sin_t + k1 * k_dot_v
+            b2 = v2 * cos_t + (k0 * v1 - k1 * v0) * sin_t + k2 * k_dot_v
+            b_norm = np.sqrt(b0**2 + b1**2 + b2**2)
+            body_axis_sys[n, j, 0] = b0 / b_norm
+            body_axis_sys[n, j, 1] = b1 / b_norm
+            body_axis_sys[n, j, 2] = b2 / b_norm
+
+def get_coord_sys (rr,vv, angle_quat, axis_quat):
+    """Orbit (LVLH) and body frames along a trajectory, one row per axis.
+
+    The orbit frame has z towards the Earth centre, y along the negative orbit
+    normal of the second sample and x = y × z. The body frame is the orbit
+    frame rotated by `angle_quat` degrees about `axis_quat`, given in orbit
+    frame coordinates.
+
+    Parameters
+    ----------
+    rr, vv : numpy.ndarray
+        Positions and velocities, shape (N, 3).
+    angle_quat : float
+        Rotation angle (deg).
+    axis_quat : list of float
+        Rotation axis in the orbit frame.
+
+    Returns
+    -------
+    orbit_axis_sys, body_axis_sys : numpy.ndarray
+        Contiguous (N, 3, 3) arrays whose rows are the x, y and z axes.
+
+    """
+    rr = np.ascontiguousarray(rr, dtype=np.float64)
+    vv = np.asarray(vv, dtype=np.float64)
+    axis_orb = np.asarray(axis_quat, dtype=np.float64)/np.linalg.norm(axis_quat)
+
+    normal = np.cross(rr[1], vv[1])
+    y_axis_orb_coord = -normal/np.linalg.norm(normal)
+
+    orbit_axis_sys = np.empty((len(rr), 3, 3))
+    body_axis_sys = np.empty((len(rr), 3, 3))
+    _coord_sys_batch(rr, y_axis_orb_coord, axis_orb, float(np.radians(angle_quat)), orbit_axis_sys, body_axis_sys)
+
+    return orbit_axis_sys, body_axis_sys
@@ -0,0 +1,206 @@
+import numpy as np
+
+from numba import njit as jit
+from numba import prange
+
+from modules.forces import (func_twobody_terms,
+                            ForceModel,
+                            NO_EPHEM,
+                            N_TERMS,
+                            N_PARAMS,
+                            perigee_radius
+                            )
+
+
+### STACKED COWELL'S PROPAGATOR ###
+#Force terms of every Cowell method of `propagate`
+COWELL_METHODS = {'Cowell (wo/perturbations)': (),
+                  'Cowell (w/ some perturbations)': ('J2', 'drag'),
+                  'Cowell (w/ perturbations)': ('J2', 'drag', 'third_body', 'srp')}
+
+MAX_STEPS = 10_000_000
+
+#Dormand-Prince 5(4) coefficients
+C2, C3, C4, C5 = 1/5, 3/10, 4/5, 8/9
+A21 = 1/5
+A31, A32 = 3/40, 9/40
+A41, A42, A43 = 44/45, -56/15, 32/9
+A51, A52, A53, A54 = 19372/6561, -25360/2187, 64448/6561, -212/729
+A61, A62, A63, A64, A65 = 9017/3168, -355/33, 46732/5247, 49/176, -5103/18656
+B1, B3, B4, B5, B6 = 35/384, 500/1113, 125/192, -2187/6784, 11/84
+E1, E3, E4, E5, E6, E7 = 71/57600, -71/16695, 71/1920, -17253/339200, 22/525, -1/40
+
+
+@jit
+def _dopri5(k, params, ephem, mask, counters, u0, times, out, rtol, atol):
+    """Integrate one state from t=0 through the sorted `times`, all of the same sign.
+
+    The step is shortened to land exactly on every requested time, so the
+    output needs no interpolation. Returns False if the integration failed.
+
+    """
+    y = u0.copy()
+    t = 0.0
+    direction = 1.0 if times[-1] >= 0 else -1.0
+    h = direction * 10.0
+    f0 = func_twobody_terms(t, y, k, params, ephem, mask, counters)
+
+    n_steps = 0
+    for j in range(times.shape[0]):
+        t_target = times[j]
+        while direction * (t_target - t) > 0:
+            n_steps += 1
+            if n_steps > MAX_STEPS:
+                return False
+
+            h_step = h
+            last = False
+            if direction * (t + h_step - t_target) >= 0:
+                h_step = t_target - t
+                last = True
+
+            k1 = f0
+            k2 = func_twobody_terms(t + C2 * h_step, y + h_step * (A21 * k1), k, params, ephem, mask, counters)
+            k3 = func_twobody_terms(t + C3 * h_step, y + h_step * (A31 * k1 + A32 * k2), k, params, ephem, mask, counters)
+            k4 = func_twobody_terms(t + C4 * h_step,
+                      y + h_step * (A41 * k1 + A42 * k2 + A43 * k3), k, params, ephem, mask, counters)
+            k5 = func_twobody_terms(t + C5 * h_step,
+                      y + h_step * (A51 * k1 + A52 * k2 + A53 * k3 + A54 * k4), k, params, ephem, mask, counters)
+            k6 = func_twobody_terms(t + h_step,
+                      y + h_step * (A61 * k1 + A62 * k2 + A63 * k3 + A64 * k4 + A65 * k5),
+                      k, params, ephem, mask, counters)
+            y_new = y + h_step * (B1 * k1 + B3 * k3 + B4 * k4 + B5 * k5 + B6 * k6)
+            k7 = func_twobody_terms(t + h_step, y_new, k, params, ephem, mask, counters)
+
+            #Per-satellite error control
+            err = h_step * (E1 * k1 + E3 * k3 + E4 * k4 + E5 * k5 + E6 * k6 + E7 * k7)
+            err_norm = 0.0
+            for m in range(6):
+                scale = atol + rtol * max(abs(y[m]), abs(y_new[m]))
+                err_norm += (err[m] / scale) ** 2
+            err_norm = np.sqrt(err_norm / 6)
+
+            if err_norm <= 1.0:
+                t = t_target if last else t + h_step
+                y = y_new
+                f0 = k7
+                factor = 10.0 if err_norm == 0 else min(10.0, 0.9 * err_norm ** -0.2)
+                #Keep the free step size when the step was only cut to hit an output time
+                if not last or abs(h_step * factor) > abs(h):
+                    h = h_step * factor
+            else:
+                h = h_step * max(0.2, 0.9 * err_norm ** -0.2)
+                if abs(h) < 1e-12:
+                    return False
+
+        for m in range(6):
+            out[j, m] = y[m]
+
+    return True
+
+
+@jit(parallel=True)
+def _cowell_batch(k, u0, tofs, params, masks, ephem, t_offsets, rtol, atol, out, success, counters):
+    t_first, dt, moon_nodes, sun_nodes = ephem
+
+    for i in prange(u0.shape[0]):
+        ephem_i = (t_first - t_offsets[i], dt, moon_nodes, sun_nodes)
+        order = np.argsort(tofs[i])
+        times = tofs[i][order]
+        states = np.empty((times.shape[0], 6))
+
+        ok = True
+        n_neg = np.searchsorted(times, 0.0)
+        if n_neg > 0:
+            #Times before the epoch are integrated backwards from t=0
+            ok = _dopri5(k, params[i], ephem_i, masks[i], counters[i], u0[i], times[:n_neg][::-1].copy(),
+                         states[:n_neg][::-1], rtol, atol)
+        if ok and n_neg < times.shape[0]:
+            ok = _dopri5(k, params[i], ephem_i, masks[i], counters[i], u0[i], times[n_neg:],
+                         states[n_neg:], rtol, atol)
+
+        success[i] = ok
+        for j in range(times.shape[0]):
+            for m in range(6):
+                out[i, order[j], m] = states[j, m] if ok else np.nan
+
+    return out, success
+
+
+def cowell_batch(k, r0, v0, tofs, method='Cowell (wo/perturbations)', A_over_m=None, ephem=None,
+                 t_offsets=None, rtol=1e-11, atol=1e-12, force_models=None):
+    """Integrate many satellites with Cowell's method in one compiled call.
+
+    Every satellite runs its own adaptive Dormand-Prince 5(4) integration,
+    with its own error control, in parallel over a shared force model.
+
+    Parameters
+    ----------
+    k : float
+        Standard gravitational parameter (km3/s2).
+    r0, v0 : numpy.ndarray
+        Initial positions (km) and velocities (km/s), shape (N_sat, 3).
+    tofs : numpy.ndarray
+        Times of flight from each satellite epoch (s), shape (N_t,) or
+        (N_sat, N_t).
+    method : str
+        One of the keys of COWELL_METHODS, used when `force_models` is None.
+    A_over_m : numpy.ndarray, optional
+        Area over mass of every satellite (km2/kg), needed with perturbations.
+    ephem : tuple, optional
+        Moon and Sun ephemeris from propagation.get_third_body_ephem, needed
+        for the third body and radiation pressure terms.
+    t_offsets : numpy.ndarray, optional
+        Seconds from the ephemeris window start to each satellite epoch.
+    force_models : forces.ForceModel or sequence of forces.ForceModel, optional
+        One model for every satellite or one per satellite. Their evaluation
+        counters are updated with the work of their satellites.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        States [x, y, z, vx, vy, vz] of shape (N_sat, N_t, 6), NaN for the
+        satellites whose integration failed.
+    success : numpy.ndarray
+        Boolean array of shape (N_sat,).
+
+    """
+    r0 = np.asarray(r0, dtype=np.float64).reshape(-1, 3)
+    v0 = np.asarray(v0, dtype=np.float64).reshape(-1, 3)
+    u0 = np.ascontiguousarray(np.hstack((r0, v0)))
+    n_sat = u0.shape[0]
+
+    tofs = np.asarray(tofs, dtype=np.float64)
+    if tofs.ndim == 1:
+        #A writeable copy, read-only views would compile a second specialization
+        tofs = np.repeat(tofs[None, :], n_sat, axis=0)
+    tofs = np.ascontiguousarray(tofs)
+
+    if force_models is None:
+        force_models = ForceModel(COWELL_METHODS[method])
+    if isinstance(force_models, ForceModel):
+        force_models = [force_models] * n_sat
+
+    A_over_m = np.zeros(n_sat) if A_over_m is None else np.asarray(A_over_m, dtype=np.float64)
+    #The zonal degree of every satellite follows from its initial perigee
+    r_min = perigee_radius(k, r0, v0)
+    params = np.array([model.params(A_over_m[i], r_min[i])
+                       for i, model in enumerate(force_models)]).reshape(n_sat, N_PARAMS)
+    masks = np.array([model.mask for model in force_models], dtype=np.int64)
+    if ephem is None:
+        if any(model.needs_ephem for model in force_models):
+            raise ValueError("Third body and radiation pressure terms need the Moon and Sun ephemeris")
+        ephem = NO_EPHEM
+    t_offsets = np.zeros(n_sat) if t_offsets is None else np.ascontiguousarray(t_offsets, dtype=np.float64)
+
+    out = np.empty((n_sat, tofs.shape[1], 6))
+    success = np.empty(n_sat, dtype=np.bool_)
+    counters = np.zeros((n_sat, N_TERMS), dtype=np.int64)
+
+    out, success = _cowell_batch(k, u0, tofs, params, masks, ephem, t_offsets, rtol, atol, out, success, counters)
+
+    #Every satellite counted its own evaluations, without races between threads
+    for i, model in enumerate(force_models):
+        model.evaluations += counters[i]
+
+    return out, success
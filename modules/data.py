@@ -5,6 +5,8 @@ import datetime
 import numpy as np
 import csv
 
+from modules.propagation import clear_satrec_cache
+
 def read_last_query_time(file_path):
     if os.path.exists(file_path):
         with open(file_path, "r") as file:
@@ -110,11 +112,14 @@ def update_sat_data_shapes_and_params (updated_sat_data):
         
         item["DECAY_DATE"] = "NO DECAY"
 
-
-        mean_anomaly = np.radians(float(item['MEAN_ANOMALY']))
-        eccentricity = float(item['ECCENTRICITY'])
-        true_anomaly = from_mean_to_true_anomaly(mean_anomaly, eccentricity)
-        item['TRUE_ANOMALY'] = round(true_anomaly, 4)
+    #Kepler's equation is solved for the whole catalog at once
+    mean_anomaly = np.radians([float(item['MEAN_ANOMALY']) for item in updated_sat_data])
+    eccentricity = np.array([float(item['ECCENTRICITY']) for item in updated_sat_data])
+    true_anomaly, converged = mean_to_true_anomaly(mean_anomaly, eccentricity)
+    if not converged.all():
+        print(f"Kepler's equation did not converge for {np.count_nonzero(~converged)} objects")
+    for item, nu in zip(updated_sat_data, np.round(true_anomaly, 4)):
+        item['TRUE_ANOMALY'] = float(nu)
 
     return updated_sat_data
 
@@ -161,31 +166,52 @@ def get_sat_data():
     with open(f"database/updated_all_sat.json", "w") as json_file:
         json.dump(updated_sat_data_shapes_and_params, json_file, indent=2)
 
+    #The catalog has been refreshed, parsed TLEs may be outdated
+    clear_satrec_cache()
 
 
 
-def from_mean_to_true_anomaly(M, e, tol=1e-10):
+
+def mean_to_true_anomaly(M, e, tol=1e-10, max_iter=50):
     """
-    Solves Kepler's equation M = E - e*sin(E) for E using the Newton-Raphson method.
-    """    
+    Solves Kepler's equation M = E - e*sin(E) for whole arrays of mean anomaly
+    (rad) and eccentricity with a bounded Newton-Raphson iteration.
+
+    Returns the true anomaly in degrees within [0, 360) and a boolean mask,
+    False where the iteration did not reach `tol` within `max_iter` steps
+    and for open orbits (e >= 1), whose true anomaly is NaN.
+    """
+    e = np.asarray(e, dtype=float)
+    #The initial guesses converge for mean anomalies within one revolution
+    M = np.mod(np.asarray(M, dtype=float), 2 * np.pi)
+    M, e = np.broadcast_arrays(M, e)
+
     # Initial guess
-    E = M if e < 0.8 else np.pi
-    
-    # Newton-Raphson iteration
-    while True:
+    E = np.where(e < 0.8, M, np.pi)
+    converged = np.zeros(M.shape, dtype=bool)
+
+    # Newton-Raphson iteration, converged elements are left untouched
+    for _ in range(max_iter):
         f = E - e * np.sin(E) - M
-        E_next = E - f / (1 - e * np.cos(E))
-        if abs(E_next - E) < tol:
+        step = f / (1 - e * np.cos(E))
+        E = np.where(converged, E, E - step)
+        converged |= np.abs(step) < tol
+        if converged.all():
             break
-        E = E_next
-    
-    nu = 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2),
-                               np.sqrt(1 - e) * np.cos(E / 2))
-    
-    if nu < 0:
-        nu += 2 * np.pi
 
-    nu = np.degrees(nu)    
+    with np.errstate(invalid='ignore'):
+        nu = 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2),
+                            np.sqrt(1 - e) * np.cos(E / 2))
+    nu = np.degrees(np.mod(nu, 2 * np.pi))
+
+    #Open orbits (e >= 1) have no solution here
+    closed = e < 1
+    return np.where(closed, nu, np.nan), converged & closed & np.isfinite(nu)
 
-    return nu
 
+def from_mean_to_true_anomaly(M, e, tol=1e-10):
+    """
+    Solves Kepler's equation M = E - e*sin(E) for E using the Newton-Raphson method.
+    """    
+    nu, _ = mean_to_true_anomaly(M, e, tol)
+    return float(nu)
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+
+### ON-DISK PROPAGATION CACHE ###
+#Trajectories are stored once per content hash, so app restarts, several
+#workers and repeated campaigns share them
+CACHE_DIR = "database/propagation_cache"
+CACHE_VERSION = 1 #bump when a propagator changes its results
+CACHE_BUDGET_BYTES = 2 * 1024**3 #least recently used trajectories are deleted beyond it
+
+ELEMENT_KEYS = ("SEMIMAJOR_AXIS", "ECCENTRICITY", "INCLINATION", "RA_OF_ASC_NODE",
+                "ARG_OF_PERICENTER", "TRUE_ANOMALY", "EPOCH")
+
+
+def _source(item, method, force_model=None):
+    if method == 'SGP4' and item['OBJECT_ID'] != 'CREATED BY USER':
+        return {"tle": [item['TLE_LINE1'], item['TLE_LINE2']]}
+    source = {key: item[key] for key in ELEMENT_KEYS}
+    if force_model is not None:
+        source.update(span=item['span'], mass=item['mass'], force_terms=list(force_model.terms),
+                      C_D=force_model.C_D, C_R=force_model.C_R)
+        if 'zonal' in force_model.terms:
+            source.update(zonal_degree=force_model.zonal_degree, zonal_tolerance=force_model.zonal_tolerance)
+    return source
+
+
+def _hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def trajectory_key(item, method, epochs, force_model=None):
+    """Hash of everything that determines the trajectory of one object.
+
+    Parameters
+    ----------
+    item : dict
+        Catalog record of the object.
+    method : str
+        Propagator, as selected in the app.
+    epochs : astropy.time.Time
+        Epoch grid of the propagation.
+    force_model : forces.ForceModel, optional
+        Force terms and coefficients of the Cowell methods.
+
+    """
+    return _hash({
+        "version": CACHE_VERSION,
+        "method": method,
+        "grid": [epochs[0].utc.isot, epochs[-1].utc.isot, len(epochs)],
+        "source": _source(item, method, force_model),
+    })
+
+
+def object_key(item, method, force_model=None):
+    """Hash of the motion of one object whatever the epoch grid, as trajectory_key without the grid."""
+    return _hash({
+        "version": CACHE_VERSION,
+        "method": method,
+        "source": _source(item, method, force_model),
+    })
+
+
+def _path(key):
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.npy")
+
+
+def load_trajectory(key):
+    """Memory-mapped (N_t, 6) states of a cached trajectory, or None if missing."""
+    try:
+        states = np.load(_path(key), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    #The modification time records the last use, see prune_cache
+    try:
+        os.utime(_path(key))
+    except OSError:
+        pass
+    return states
+
+
+def save_trajectory(key, states):
+    """Store (N_t, 6) states, atomically so concurrent workers never read a partial file."""
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as npy_file:
+        np.save(npy_file, np.asarray(states, dtype=np.float64))
+    os.replace(tmp_path, path)
+
+
+def prune_cache(budget_bytes=CACHE_BUDGET_BYTES):
+    """Delete the least recently used trajectories until the cache fits in `budget_bytes`.
+
+    Returns the number of bytes deleted. Files another worker still holds
+    open or memory-mapped are skipped where the platform refuses to delete
+    them.
+
+    """
+    files = []
+    for directory, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    deleted = 0
+    for _, size, path in sorted(files):
+        if total - deleted <= budget_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        deleted += size
+    return deleted
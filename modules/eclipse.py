@@ -0,0 +1,62 @@
+from astropy import units as u
+from poliastro.bodies import Earth, Sun
+
+import numpy as np
+
+
+### EARTH SHADOW ###
+ILLUMINATED = 0
+PENUMBRA = 1
+UMBRA = 2
+SHADOW_MODEL = 'cylindrical' #'cylindrical' (umbra only, as the original check) or 'conical'
+
+
+def eclipse_timeline(rr, sun_coords, model=None):
+    """Illumination state of objects along a trajectory, in Earth's shadow or not.
+
+    The cylindrical model puts in umbra every object behind the Earth and
+    closer than one Earth radius to the Sun-Earth line. The conical model
+    compares the apparent radii of the Sun and the Earth seen from the object
+    with their angular separation, and also flags penumbra (partial and
+    annular eclipses).
+
+    Parameters
+    ----------
+    rr : numpy.ndarray
+        Positions (km), shape (N, 3) or (M, N, 3) for M objects.
+    sun_coords : numpy.ndarray
+        Sun positions (km) at the same epochs, shape (N, 3).
+    model : str, optional
+        'cylindrical' or 'conical', SHADOW_MODEL by default.
+
+    Returns
+    -------
+    timeline : numpy.ndarray
+        ILLUMINATED, PENUMBRA or UMBRA per epoch, int8 array of shape rr.shape[:-1].
+
+    """
+    model = model or SHADOW_MODEL
+    rr = np.asarray(rr, dtype=float)
+    sun = np.asarray(sun_coords, dtype=float)
+    R_E = Earth.R.to(u.km).value
+
+    timeline = np.full(rr.shape[:-1], ILLUMINATED, dtype=np.int8)
+    with np.errstate(invalid='ignore'):
+        if model == 'cylindrical':
+            sun_hat = sun / np.linalg.norm(sun, axis=-1, keepdims=True)
+            along = np.einsum('...i,...i->...', rr, sun_hat)
+            across = np.linalg.norm(rr - along[..., None] * sun_hat, axis=-1)
+            timeline[(along < 0) & (across < R_E)] = UMBRA
+        else:
+            R_S = Sun.R.to(u.km).value
+            r_sun = sun - rr
+            d_sun = np.linalg.norm(r_sun, axis=-1)
+            d_earth = np.linalg.norm(rr, axis=-1)
+            radius_sun = np.arcsin(R_S / d_sun)
+            radius_earth = np.arcsin(R_E / d_earth)
+            separation = np.arccos(np.clip(-np.einsum('...i,...i->...', rr, r_sun) / (d_earth * d_sun), -1, 1))
+            timeline[separation < radius_sun + radius_earth] = PENUMBRA
+            timeline[separation <= radius_earth - radius_sun] = UMBRA
+
+    return timeline
+
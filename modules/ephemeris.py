@@ -0,0 +1,85 @@
+from astropy import units as u
+from astropy.time import Time
+
+import numpy as np
+
+
+COVER_TOLERANCE = 1e-3 #s, epochs of the app round-trip through ISO strings with millisecond precision
+
+
+class ContinuousEphemeris:
+    """Continuous trajectory of one object, evaluated at arbitrary times.
+
+    It either wraps the dense output of a Cowell integration or keeps the
+    sampled states of any other propagator and evaluates them with a cubic
+    Hermite interpolant built from positions and velocities. Times are
+    seconds since `epoch`.
+
+    """
+
+    def __init__(self, epoch, t, rr=None, vv=None, sol=None):
+        self.epoch = Time(epoch)
+        self.t = np.asarray(t, dtype=float)
+        self.rr = None if rr is None else np.asarray(rr, dtype=float)
+        self.vv = None if vv is None else np.asarray(vv, dtype=float)
+        self.sol = sol
+
+    @classmethod
+    def from_samples(cls, epoch, t, rr, vv):
+        return cls(epoch, t, rr=rr, vv=vv)
+
+    @classmethod
+    def from_dense_output(cls, epoch, sol, t):
+        return cls(epoch, t, sol=sol)
+
+    @property
+    def t_min(self):
+        return self.t.min()
+
+    @property
+    def t_max(self):
+        return self.t.max()
+
+    @property
+    def nbytes(self):
+        arrays = [self.t, self.rr, self.vv]
+        if self.sol is not None:
+            arrays += [self.sol.ts] + [array for interpolant in self.sol.interpolants 
+                                       for array in vars(interpolant).values() if isinstance(array, np.ndarray)]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def tofs(self, epochs):
+        return (Time(epochs) - self.epoch).to(u.s).value
+
+    def covers(self, epochs):
+        tofs = np.atleast_1d(self.tofs(epochs))
+        return bool(tofs.min() >= self.t_min - COVER_TOLERANCE and tofs.max() <= self.t_max + COVER_TOLERANCE)
+
+    def sample(self, tofs):
+        """Return positions (km) and velocities (km/s) at `tofs` seconds since the epoch."""
+        tofs = np.atleast_1d(np.asarray(tofs, dtype=float))
+
+        if self.sol is not None:
+            y = self.sol(tofs)
+            return y[:3].T, y[3:].T
+
+        t = self.t
+        i = np.clip(np.searchsorted(t, tofs, side='right') - 1, 0, len(t) - 2)
+        h = (t[i + 1] - t[i])[:, None]
+        s = ((tofs - t[i]) / h[:, 0])[:, None]
+
+        r0, r1 = self.rr[i], self.rr[i + 1]
+        m0, m1 = self.vv[i] * h, self.vv[i + 1] * h
+
+        #Cubic Hermite basis and its derivative
+        s2 = s * s
+        s3 = s2 * s
+        rr = ((2 * s3 - 3 * s2 + 1) * r0 + (s3 - 2 * s2 + s) * m0 +
+              (-2 * s3 + 3 * s2) * r1 + (s3 - s2) * m1)
+        vv = ((6 * s2 - 6 * s) * r0 + (3 * s2 - 4 * s + 1) * m0 +
+              (-6 * s2 + 6 * s) * r1 + (3 * s2 - 2 * s) * m1) / h
+
+        return rr, vv
+
+    def sample_epochs(self, epochs):
+        return self.sample(self.tofs(epochs))
@@ -0,0 +1,387 @@
+from astropy import units as u
+from poliastro.bodies import Earth, Moon
+
+import numpy as np
+import time
+
+from numba import njit as jit
+
+from poliastro.constants import rho0_earth, H0_earth
+
+
+#Constants of the force model, converted once to plain floats (km, kg, s)
+R_EARTH = Earth.R.to(u.km).value
+J2_EARTH = Earth.J2.value
+RHO0_EARTH = rho0_earth.to(u.kg / u.km**3).value
+H0_EARTH = H0_earth.to(u.km).value
+K_MOON = Moon.k.to(u.km**3 / u.s**2).value
+C_D = 2.2
+C_R = 1.4 #this is a default value
+WDIVC_S = 1367/((10*6)*299792)
+
+#Zonal harmonics J_n = -sqrt(2n + 1) C_n0 of EGM2008, index n
+ZONAL_MAX_DEGREE = 8
+ZONAL_J = np.zeros(ZONAL_MAX_DEGREE + 1)
+ZONAL_J[2:] = -np.sqrt(2 * np.arange(2, ZONAL_MAX_DEGREE + 1) + 1) * np.array([
+    -4.84165143790815e-04, 9.57161207093473e-07, 5.39965866638991e-07, 6.86702913736681e-08,
+    -1.49953927978527e-07, 9.05120844521618e-08, 4.94756003005199e-08])
+ZONAL_TOLERANCE = 1e-9 #km/s2, largest acceleration of the zonal terms left out
+
+
+@jit
+def ephem_position(t, t_first, dt, nodes):
+    """Linearly interpolate an ephemeris sampled on a uniform grid.
+
+    Parameters
+    ----------
+    t : float
+        Time (s), in the same origin as `t_first`.
+    t_first : float
+        Time of the first node (s).
+    dt : float
+        Spacing between nodes (s).
+    nodes : numpy.ndarray
+        Positions at the nodes, shape (N, 3) (km).
+
+    """
+    x = (t - t_first) / dt
+    i = int(np.floor(x))
+    if i < 0:
+        i = 0
+    elif i > nodes.shape[0] - 2:
+        i = nodes.shape[0] - 2
+    w = x - i
+
+    pos = np.empty(3)
+    for m in range(3):
+        pos[m] = (1 - w) * nodes[i, m] + w * nodes[i + 1, m]
+    return pos
+
+
+@jit
+def func_twobody_fast(t0, u_, k):
+    """Compiled differential equation of the two body problem."""
+    x, y, z, vx, vy, vz = u_[0], u_[1], u_[2], u_[3], u_[4], u_[5]
+    r3 = (x * x + y * y + z * z) ** 1.5
+
+    du = np.empty(6)
+    du[0] = vx
+    du[1] = vy
+    du[2] = vz
+    du[3] = -k * x / r3
+    du[4] = -k * y / r3
+    du[5] = -k * z / r3
+    return du
+
+
+#Force terms that can be composed on top of the two body problem, in bit order
+FORCE_TERMS = ('J2', 'drag', 'third_body', 'srp', 'zonal')
+N_TERMS = len(FORCE_TERMS)
+N_PARAMS = 4
+
+#Placeholder ephemeris for force models without Moon or Sun terms
+NO_EPHEM = (0.0, 1.0, np.zeros((2, 3)), np.zeros((2, 3)))
+
+
+@jit
+def j2_accel(t0, u_, k, params, ephem, du):
+    x, y, z = u_[0], u_[1], u_[2]
+    r2 = x * x + y * y + z * z
+    r = np.sqrt(r2)
+
+    #J2 perturbation
+    factor = 1.5 * k * J2_EARTH * R_EARTH * R_EARTH / (r2 * r2 * r)
+    z2_r2 = 5.0 * z * z / r2
+    du[3] += factor * x * (z2_r2 - 1)
+    du[4] += factor * y * (z2_r2 - 1)
+    du[5] += factor * z * (z2_r2 - 3)
+
+
+@jit
+def drag_accel(t0, u_, k, params, ephem, du):
+    x, y, z, vx, vy, vz = u_[0], u_[1], u_[2], u_[3], u_[4], u_[5]
+    A_over_m, C_D = params[0], params[1]
+    r = np.sqrt(x * x + y * y + z * z)
+
+    #Atmospheric drag perturbation
+    v = np.sqrt(vx * vx + vy * vy + vz * vz)
+    rho = RHO0_EARTH * np.exp(-(r - R_EARTH) / H0_EARTH)
+    drag = -0.5 * rho * C_D * A_over_m * v
+    du[3] += drag * vx
+    du[4] += drag * vy
+    du[5] += drag * vz
+
+
+@jit
+def third_body_accel(t0, u_, k, params, ephem, du):
+    t_first, dt, moon_nodes, sun_nodes = ephem
+    x, y, z = u_[0], u_[1], u_[2]
+
+    #3rd body perturbation
+    moon = ephem_position(t0, t_first, dt, moon_nodes)
+    dx, dy, dz = moon[0] - x, moon[1] - y, moon[2] - z
+    d3 = (dx * dx + dy * dy + dz * dz) ** 1.5
+    m3 = (moon[0] ** 2 + moon[1] ** 2 + moon[2] ** 2) ** 1.5
+    du[3] += K_MOON * (dx / d3 - moon[0] / m3)
+    du[4] += K_MOON * (dy / d3 - moon[1] / m3)
+    du[5] += K_MOON * (dz / d3 - moon[2] / m3)
+
+
+@jit
+def srp_accel(t0, u_, k, params, ephem, du):
+    t_first, dt, moon_nodes, sun_nodes = ephem
+    x, y, z = u_[0], u_[1], u_[2]
+    A_over_m, C_R = params[0], params[2]
+
+    #radiation pressure perturbation, only when the Sun is in line of sight
+    sun = ephem_position(t0, t_first, dt, sun_nodes)
+    r_sat = np.sqrt(x * x + y * y + z * z)
+    r_sun = np.sqrt(sun[0] ** 2 + sun[1] ** 2 + sun[2] ** 2)
+    theta = np.arccos((x * sun[0] + y * sun[1] + z * sun[2]) / r_sat / r_sun)
+    theta_1 = np.arccos(R_EARTH / r_sat)
+    theta_2 = np.arccos(R_EARTH / r_sun)
+    if theta_1 + theta_2 - theta > 0:
+        srp = -WDIVC_S / (r_sun * r_sun) * C_R * A_over_m / r_sun
+        du[3] += srp * sun[0]
+        du[4] += srp * sun[1]
+        du[5] += srp * sun[2]
+
+
+@jit
+def zonal_accel(t0, u_, k, params, ephem, du):
+    x, y, z = u_[0], u_[1], u_[2]
+    degree = int(params[3])
+    if degree < 3:
+        return
+    r = np.sqrt(x * x + y * y + z * z)
+    s = z / r
+
+    #Zonal harmonics J3 to J_degree, on top of the J2 term:
+    #a_n = k/r2 J_n (R/r)^n [((n + 1) P_n + s P_n') r/|r| - P_n' z/|z|]
+    p_prev, p = 1.0, s
+    dp_prev, dp = 0.0, 1.0
+    ratio = R_EARTH / r
+    ratio_n = ratio
+    radial = 0.0
+    polar = 0.0
+    for n in range(2, degree + 1):
+        p_prev, p = p, ((2 * n - 1) * s * p - (n - 1) * p_prev) / n
+        dp_prev, dp = dp, dp_prev + (2 * n - 1) * p_prev
+        ratio_n *= ratio
+        if n >= 3:
+            radial += ZONAL_J[n] * ratio_n * ((n + 1) * p + s * dp)
+            polar += ZONAL_J[n] * ratio_n * dp
+
+    factor = k / (r * r)
+    du[3] += factor * radial * x / r
+    du[4] += factor * radial * y / r
+    du[5] += factor * (radial * z / r - polar)
+
+
+def zonal_degree(r_min, tolerance=ZONAL_TOLERANCE):
+    """Lowest zonal degree whose omitted terms stay below `tolerance` (km/s2) down to radius `r_min` (km).
+
+    The bound of the term of degree n is k/r2 |J_n| (R/r)^n (n + 1)(n + 2)/2,
+    so GEO objects keep J2 only and low LEO objects go up to ZONAL_MAX_DEGREE.
+
+    """
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    n = np.arange(ZONAL_MAX_DEGREE + 1)
+    bound = k / r_min**2 * np.abs(ZONAL_J) * (R_EARTH / r_min) ** n * (n + 1) * (n + 2) / 2
+    needed = np.nonzero(bound[3:] > tolerance)[0]
+    return 2 if len(needed) == 0 else int(needed[-1]) + 3
+
+
+def perigee_radius(k, r, v):
+    """Perigee radii (km) of osculating orbits from positions (km) and velocities (km/s), shape (N, 3)."""
+    r = np.atleast_2d(r)
+    v = np.atleast_2d(v)
+    r_norm = np.linalg.norm(r, axis=1)
+    h2 = np.sum(np.cross(r, v) ** 2, axis=1)
+    energy = np.sum(v * v, axis=1) / 2 - k / r_norm
+    ecc = np.sqrt(np.maximum(1 + 2 * energy * h2 / k**2, 0.0))
+    return h2 / k / (1 + ecc)
+
+
+@jit
+def _term_accel(term_id, t0, u_, k, params, ephem, du):
+    if term_id == 0:
+        j2_accel(t0, u_, k, params, ephem, du)
+    elif term_id == 1:
+        drag_accel(t0, u_, k, params, ephem, du)
+    elif term_id == 2:
+        third_body_accel(t0, u_, k, params, ephem, du)
+    elif term_id == 3:
+        srp_accel(t0, u_, k, params, ephem, du)
+    else:
+        zonal_accel(t0, u_, k, params, ephem, du)
+
+
+@jit
+def func_twobody_terms(t0, u_, k, params, ephem, mask, counters):
+    """Compiled two body problem plus the force terms selected by `mask`.
+
+    Parameters
+    ----------
+    t0 : float
+        Time since the orbit epoch (s).
+    u_ : numpy.ndarray
+        Six component state vector [x, y, z, vx, vy, vz] (km, km/s).
+    k : float
+        Standard gravitational parameter (km3/s2).
+    params : numpy.ndarray
+        [A_over_m (km2/kg), C_D, C_R, zonal degree].
+    ephem : tuple
+        Moon and Sun ephemeris, see func_twobody_w_pert_fast.
+    mask : int
+        Bit i enables FORCE_TERMS[i].
+    counters : numpy.ndarray
+        Evaluation count of every term, incremented in place.
+
+    """
+    du = func_twobody_fast(t0, u_, k)
+    for term_id in range(N_TERMS):
+        if mask & (1 << term_id):
+            _term_accel(term_id, t0, u_, k, params, ephem, du)
+            counters[term_id] += 1
+    return du
+
+
+@jit
+def func_twobody_w_s_pert_fast(t0, u_, k, A_over_m):
+    """Compiled two body problem with J2 and exponential drag perturbations."""
+    params = np.array([A_over_m, C_D, C_R, 2.0])
+    du = func_twobody_fast(t0, u_, k)
+    j2_accel(t0, u_, k, params, NO_EPHEM, du)
+    drag_accel(t0, u_, k, params, NO_EPHEM, du)
+    return du
+
+
+@jit
+def func_twobody_w_pert_fast(t0, u_, k, A_over_m, ephem):
+    """Compiled two body problem with J2, drag, Moon and radiation pressure.
+
+    Parameters
+    ----------
+    t0 : float
+        Time since the orbit epoch (s).
+    u_ : numpy.ndarray
+        Six component state vector [x, y, z, vx, vy, vz] (km, km/s).
+    k : float
+        Standard gravitational parameter (km3/s2).
+    A_over_m : float
+        Area over mass of the object (km2/kg).
+    ephem : tuple
+        (t_first, dt, moon_nodes, sun_nodes) Moon and Sun positions (km) on a
+        uniform grid, with node times measured from the orbit epoch.
+
+    """
+    params = np.array([A_over_m, C_D, C_R, 2.0])
+    du = func_twobody_fast(t0, u_, k)
+    j2_accel(t0, u_, k, params, ephem, du)
+    drag_accel(t0, u_, k, params, ephem, du)
+    third_body_accel(t0, u_, k, params, ephem, du)
+    srp_accel(t0, u_, k, params, ephem, du)
+    return du
+
+
+@jit
+def _repeat_term(term_id, n, u_, k, params, ephem):
+    du = np.zeros(6)
+    for _ in range(n):
+        _term_accel(term_id, 0.0, u_, k, params, ephem, du)
+    return du
+
+
+_term_costs = {}
+
+def term_costs(n=100000):
+    """Seconds per evaluation of every compiled force term, measured once."""
+    if not _term_costs:
+        u_ = np.array([7000.0, 0.0, 0.0, 0.0, 7.5, 1.0])
+        k = Earth.k.to(u.km**3 / u.s**2).value
+        params = np.array([1e-8, C_D, C_R, ZONAL_MAX_DEGREE])
+        ephem = (0.0, 1e6, np.array([[3.8e5, 0.0, 0.0]] * 2), np.array([[1.5e8, 0.0, 0.0]] * 2))
+        for term_id, term in enumerate(FORCE_TERMS):
+            _repeat_term(term_id, 1, u_, k, params, ephem)
+            start = time.perf_counter()
+            _repeat_term(term_id, n, u_, k, params, ephem)
+            _term_costs[term] = (time.perf_counter() - start) / n
+    return _term_costs
+
+
+class ForceModel:
+    """Set of force terms, with drag and radiation coefficients, used for one run.
+
+    `func` has the signature of func_twobody_w_pert_fast and can be passed as
+    `f` to the Cowell propagators; cowell_batch.cowell_batch takes the model
+    itself. The compiled kernels count every evaluation of every term, and
+    the cumulative time of a term is its count times its cost from term_costs
+    (timing each call from Python would mostly measure the dispatch).
+
+    The 'zonal' term adds J3 up to `zonal_degree`; when it is None the degree
+    of every object follows from its perigee and `zonal_tolerance`.
+
+    """
+
+    def __init__(self, terms=FORCE_TERMS, C_D=C_D, C_R=C_R, zonal_degree=None, zonal_tolerance=ZONAL_TOLERANCE):
+        unknown = set(terms) - set(FORCE_TERMS)
+        if unknown:
+            raise ValueError(f"Unknown force terms {sorted(unknown)}, expected some of {FORCE_TERMS}")
+        self.terms = tuple(term for term in FORCE_TERMS if term in terms)
+        self.mask = sum(1 << FORCE_TERMS.index(term) for term in self.terms)
+        self.C_D = C_D
+        self.C_R = C_R
+        self.zonal_degree = zonal_degree
+        self.zonal_tolerance = zonal_tolerance
+        self.evaluations = np.zeros(N_TERMS, dtype=np.int64)
+
+    def without(self, *terms):
+        """Copy of the model with `terms` removed, e.g. model.without('srp') for debris."""
+        return ForceModel([term for term in self.terms if term not in terms], self.C_D, self.C_R,
+                          self.zonal_degree, self.zonal_tolerance)
+
+    def for_orbit(self, k, r0, v0):
+        """Copy with the zonal degree of one orbit fixed, sharing the evaluation counters."""
+        model = ForceModel(self.terms, self.C_D, self.C_R, self.degree(perigee_radius(k, r0, v0)[0]),
+                           self.zonal_tolerance)
+        model.evaluations = self.evaluations
+        return model
+
+    def degree(self, r_min=None):
+        """Zonal degree used for an object of perigee radius `r_min` (km), 2 without the zonal term."""
+        if 'zonal' not in self.terms:
+            return 2
+        if self.zonal_degree is not None:
+            return self.zonal_degree
+        if r_min is None:
+            return ZONAL_MAX_DEGREE
+        return zonal_degree(r_min, self.zonal_tolerance)
+
+    @property
+    def needs_ephem(self):
+        return 'third_body' in self.terms or 'srp' in self.terms
+
+    def params(self, A_over_m, r_min=None):
+        return np.array([A_over_m, self.C_D, self.C_R, self.degree(r_min)], dtype=np.float64)
+
+    def func(self, t0, u_, k, A_over_m=0.0, ephem=NO_EPHEM):
+        return func_twobody_terms(t0, u_, k, self.params(A_over_m), ephem, self.mask, self.evaluations)
+
+    def stats(self):
+        """Cumulative evaluations and estimated time (s) of every term of the model."""
+        costs = term_costs()
+        stats = {}
+        for term in self.terms:
+            evaluations = int(self.evaluations[FORCE_TERMS.index(term)])
+            stats[term] = {"evaluations": evaluations, "time_s": evaluations * costs[term]}
+        return stats
+
+    def reset_stats(self):
+        self.evaluations[:] = 0
+
+
+def shift_ephem(ephem, t_offset):
+    """Move the time origin of an ephemeris tuple forward by `t_offset` seconds."""
+    t_first, dt, moon_nodes, sun_nodes = ephem
+    return (t_first - t_offset, dt, moon_nodes, sun_nodes)
@@ -0,0 +1,170 @@
+from astropy import units as u
+from poliastro.bodies import Earth
+
+import numpy as np
+
+from modules.propagation import (propagate_twobody_batch,
+                                 elements_to_states,
+                                 get_third_body_ephem,
+                                 to_julian,
+                                 screening_states,
+                                 TWOBODY_METHODS,
+                                 SECULAR_J2_METHOD
+                                 )
+from modules.cowell_batch import cowell_batch, COWELL_METHODS
+from modules.forces import ForceModel
+from modules.parallel import sgp4_propagator_parallel
+
+
+### INCREMENTAL PROPAGATION ###
+#Trajectories of earlier propagations are resampled where they overlap the
+#new window, only the epochs before and after them are propagated
+COVERAGE_TOL = 1e-6 #s
+
+
+def _grid_tofs(ephem, epochs, t_grid, shifts):
+    """ephem.tofs(epochs), with one astropy subtraction per distinct ephemeris epoch."""
+    key = (ephem.epoch.jd1, ephem.epoch.jd2)
+    if key not in shifts:
+        shifts[key] = (epochs[0] - ephem.epoch).to(u.s).value
+    return t_grid + shifts[key]
+
+
+def find_reusable(store, object_keys, epochs):
+    """Stored ephemerides overlapping `epochs`, for the objects of `object_keys`.
+
+    Parameters
+    ----------
+    store : dict
+        Propagations of the app, whose entries map "object_keys" and
+        "ephemerides" by NORAD_CAT_ID.
+    object_keys : dict
+        disk_cache.object_key of every object to propagate, by NORAD_CAT_ID.
+    epochs : astropy.time.Time
+        New epoch grid.
+
+    Returns
+    -------
+    reusable : dict
+        (ephemeris, i0, i1) by NORAD_CAT_ID, where epochs[i0:i1] is covered;
+        the ephemeris covering most epochs wins.
+
+    """
+    wanted = {}
+    for norad_id, key in object_keys.items():
+        wanted.setdefault(key, []).append(norad_id)
+
+    t_grid = (epochs - epochs[0]).to(u.s).value
+    shifts = {}
+    reusable = {}
+    for entry in list(store.values()):
+        ephemerides = entry.get("ephemerides", {})
+        for stored_id, key in entry.get("object_keys", {}).items():
+            if key not in wanted or stored_id not in ephemerides:
+                continue
+            ephem = ephemerides[stored_id]
+            tofs = _grid_tofs(ephem, epochs, t_grid, shifts)
+            i0 = int(np.searchsorted(tofs, ephem.t_min - COVERAGE_TOL, side='left'))
+            i1 = int(np.searchsorted(tofs, ephem.t_max + COVERAGE_TOL, side='right'))
+            for norad_id in wanted[key]:
+                if i1 > i0 and (norad_id not in reusable or i1 - i0 > reusable[norad_id][2] - reusable[norad_id][1]):
+                    reusable[norad_id] = (ephem, i0, i1)
+    return reusable
+
+
+def _propagate_segment(items, epochs, method, epoch_ref, r_ref, v_ref, force_models):
+    """States of `items` over `epochs`; Cowell integrations start from r_ref, v_ref at epoch_ref."""
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    rr = np.empty((len(items), len(epochs), 3))
+    vv = np.empty((len(items), len(epochs), 3))
+
+    sgp4 = np.array([method == 'SGP4' and item['OBJECT_ID'] != 'CREATED BY USER' for item in items], dtype=bool)
+    if sgp4.any():
+        jd, fr = to_julian(epochs)
+        rr_sgp4, vv_sgp4, errors = sgp4_propagator_parallel(jd, fr, [item for item, s in zip(items, sgp4) if s])
+        rr_sgp4[errors] = np.nan
+        rr[sgp4], vv[sgp4] = rr_sgp4, vv_sgp4
+
+    if (~sgp4).any():
+        orbit_items = [item for item, s in zip(items, sgp4) if not s]
+        batch_method = 'Farnocchia' if method == 'SGP4' else method
+        if batch_method in TWOBODY_METHODS:
+            #Exact from the catalog elements, no error carried from the stored trajectory
+            r0, v0, t_epoch = elements_to_states(orbit_items, epochs[0])
+            t_seg = (epochs - epochs[0]).to(u.s).value
+            rv = propagate_twobody_batch(k, r0, v0, t_seg[None, :] - t_epoch[:, None], method=batch_method)
+        elif batch_method == SECULAR_J2_METHOD:
+            rv = screening_states(orbit_items, epochs[0], (epochs - epochs[0]).to(u.s).value)
+        else:
+            models = [model for model, s in zip(force_models, sgp4) if not s]
+            A_over_m = np.array([float(item['span'])**2/float(item['mass']) for item in orbit_items])
+            window_start = min(epochs[0], epoch_ref)
+            ephem = None
+            if any(model.needs_ephem for model in models):
+                ephem = get_third_body_ephem(window_start, max(epochs[-1], epoch_ref))
+            rv, _ = cowell_batch(k, r_ref[~sgp4], v_ref[~sgp4], (epochs - epoch_ref).to(u.s).value,
+                                 A_over_m=A_over_m, ephem=ephem, force_models=models,
+                                 t_offsets=np.full(len(orbit_items), (epoch_ref - window_start).to(u.s).value))
+        rr[~sgp4], vv[~sgp4] = rv[:, :, :3], rv[:, :, 3:]
+
+    return rr, vv
+
+
+def extend_trajectories(items, epochs, method, reusable, force_models=None):
+    """States of `items` over `epochs`, resampled from stored ephemerides where they overlap.
+
+    Objects sharing the same covered range are handled together: the epochs
+    before it are integrated backwards from its first state and the epochs
+    after it forwards from its last one, SGP4, Keplerian and secular J2
+    objects are propagated over them from their elements.
+
+    Parameters
+    ----------
+    items : list of dict
+        Catalog records, all of them in `reusable`.
+    epochs : astropy.time.Time
+        New epoch grid.
+    method : str
+        Propagator, as selected in the app.
+    reusable : dict
+        Output of find_reusable.
+    force_models : list of forces.ForceModel, optional
+        Force model of every item for the Cowell methods.
+
+    Returns
+    -------
+    states : dict
+        (rr, vv) over `epochs` by NORAD_CAT_ID.
+
+    """
+    if force_models is None:
+        force_models = [ForceModel(COWELL_METHODS.get(method, ()))] * len(items)
+
+    groups = {}
+    for item, model in zip(items, force_models):
+        _, i0, i1 = reusable[item['NORAD_CAT_ID']]
+        groups.setdefault((i0, i1), []).append((item, model))
+
+    t_grid = (epochs - epochs[0]).to(u.s).value
+    shifts = {}
+    states = {}
+    for (i0, i1), members in groups.items():
+        group_items = [item for item, _ in members]
+        group_models = [model for _, model in members]
+        rr = np.empty((len(members), len(epochs), 3))
+        vv = np.empty((len(members), len(epochs), 3))
+        for i, item in enumerate(group_items):
+            ephem = reusable[item['NORAD_CAT_ID']][0]
+            rr[i, i0:i1], vv[i, i0:i1] = ephem.sample(_grid_tofs(ephem, epochs, t_grid, shifts)[i0:i1])
+
+        if i0 > 0:
+            rr[:, :i0], vv[:, :i0] = _propagate_segment(group_items, epochs[:i0], method, epochs[i0],
+                                                        rr[:, i0], vv[:, i0], group_models)
+        if i1 < len(epochs):
+            rr[:, i1:], vv[:, i1:] = _propagate_segment(group_items, epochs[i1:], method, epochs[i1 - 1],
+                                                        rr[:, i1 - 1], vv[:, i1 - 1], group_models)
+
+        for i, item in enumerate(group_items):
+            states[item['NORAD_CAT_ID']] = rr[i], vv[i]
+
+    return states
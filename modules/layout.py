@@ -430,6 +430,7 @@ layout = dcc.Loading([
                                     {"value": "Pimienta", "label": "Pimienta"},
                                     {"value": "Vallado", "label": "Vallado"},
                                     {"value": "SGP4", "label": "SGP4"},
+                                    {"value": "Secular J2", "label": "Secular J2 (screening)"},
                                 ],
                                 style={"width": 350, "marginRight": 5},
                             ),
@@ -3,6 +3,10 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from modules.propagation import propagate, to_julian
 from modules.coord_frames import get_coord_sys
+from modules.sampling import refinement_resolution, refined_crossings
+from modules.ephemeris import ContinuousEphemeris
+from modules.sun import sun_position_teme
+from modules.eclipse import eclipse_timeline, UMBRA
 
 import numpy as np
 from astropy.time import Time
@@ -12,12 +16,22 @@ from poliastro.bodies import Earth
 from poliastro.twobody import Orbit
 from poliastro.util import time_range
 from astropy import units as u
+from functools import partial
 import ast
 
 
-def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
+#Position error (km) of the secular J2 screening trajectories against SGP4, short period
+#terms mostly (under 25 km for LEO TLEs up to 4 days old, drag included); steps within
+#the FOV widened by it are refined with SGP4 / Farnocchia
+SCREENING_POSITION_ERROR = 30
+
+
+def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data, ephemerides=None, adaptive=False, 
+                           eclipse=None, screening=False):
     epochs_array = np.array(sun_data["epochs"])
+    sun_coords = np.array(sun_data['coords'])
     observant_coords = np.array(created_data['coords'])
+    epochs_time = Time(epochs_array, scale='utc') if adaptive else None
 
     observations = []
     for observed_data in ephem_catalog_sat_data:
@@ -43,8 +57,34 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
 
         D_airy_disk = 2.44*mean_lambda*f_number
 
+        #On a coarse adaptive grid, intervals where the pair moves fast across the FOV are refined
+        refine_resolution = None
+        if adaptive:
+            refine_resolution = refinement_resolution(observant_coords, observed_coords, created_data['bodyaxis'],
+                                                      2 * np.arctan((sensor_width/2) / focal_length),
+                                                      2 * np.arctan((sensor_height/2) / focal_length))
+            #Of those, only the intervals whose fine samples reach the FOV are refined step by step
+            ephem_observed = ephemerides.get(observed_data['NORAD_CAT_ID']) if ephemerides else None
+            ephem_observant = ephemerides.get(created_data['NORAD_CAT_ID']) if ephemerides else None
+            if (ephem_observed is not None and ephem_observant is not None and
+                ephem_observed.covers(epochs_time) and ephem_observant.covers(epochs_time)):
+                refine_crossing = refined_crossings(ephem_observant, ephem_observed, epochs_time, refine_resolution,
+                                                    float(created_data['Quaternion Angle']),
+                                                    ast.literal_eval(created_data['Quaternion Vector']),
+                                                    2 * np.arctan((sensor_width/2) / focal_length),
+                                                    2 * np.arctan((sensor_height/2) / focal_length),
+                                                    SCREENING_POSITION_ERROR if screening else 0.0)
+            else:
+                refine_crossing = refine_resolution > 0
+
+        #Shadow timelines are computed once per propagation and shared by every observer
+        shadow = eclipse.get(observed_data['NORAD_CAT_ID']) if eclipse else None
+        if shadow is None:
+            shadow = eclipse_timeline(observed_coords, sun_coords)
+
         index_observable = []
         epoch_finer_ =[None]*len(epochs_array)
+        distance_finer_ = [None]*len(epochs_array)
         prev_observed_pos_cam = None
         for index, distance in enumerate(distances):
             min_object_size_observable = max(D_airy_disk,pixel_size)*distance*1000/focal_length
@@ -53,6 +93,10 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
             object_intersects_FOV = False
             observed_pos_cam = None 
 
+            if screening:
+                min_object_size_observable = (max(D_airy_disk,pixel_size)*max(distance - SCREENING_POSITION_ERROR, 0)
+                                              *1000/focal_length)
+
             if object_size >= min_object_size_observable:
                 vertical_FOV = 2 * np.arctan((sensor_height/2) / focal_length)
                 horizontal_FOV = 2 * np.arctan((sensor_width/2) / focal_length)
@@ -78,20 +122,23 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
                     object_in_FOV = False
                     object_intersects_FOV = False
 
+                if (refine_resolution is not None and refine_crossing[index] and 
+                    not object_in_FOV and not object_intersects_FOV):
+                    object_intersects_FOV = True
+
+                #Screening trajectories are approximate: every step within the widened FOV is a
+                #candidate, confirmed or rejected by the refinement with the accurate propagators
+                if screening:
+                    margin = SCREENING_POSITION_ERROR * 1000
+                    proy_y_wide = (observed_pos_cam[0] + margin) * np.tan(horizontal_FOV / 2) + margin
+                    proy_z_wide = (observed_pos_cam[0] + margin) * np.tan(vertical_FOV / 2) + margin
+                    object_intersects_FOV = (object_in_FOV or object_intersects_FOV or
+                                             (abs(observed_pos_cam[1]) <= proy_y_wide and 
+                                              abs(observed_pos_cam[2]) <= proy_z_wide))
+                    object_in_FOV = False
+
                 if object_in_FOV or object_intersects_FOV:
-                    sun_coords = np.array(sun_data['coords'])
-                    sun_coords_min_dist = sun_coords[index]
-                    r_sun_observed = (observed_coords[index]-sun_coords_min_dist)*1000
-                    r_sun_observed_norm = np.linalg.norm(r_sun_observed)
-                    r_sun_Earth = -(sun_coords_min_dist)*1000
-                    r_sun_Earth_norm = np.linalg.norm(r_sun_Earth)
-                    angle_gamma = np.arccos(np.dot(r_sun_observed/r_sun_observed_norm,
-                                                r_sun_Earth/r_sun_Earth_norm)
-                                            )
-                    h = np.sin(angle_gamma)*r_sun_observed_norm
-                    b = np.dot(r_sun_observed, r_sun_Earth/r_sun_Earth_norm)
-
-                    if h >= float(Earth.R.value) or (h < float(Earth.R.value) and b < r_sun_Earth_norm):
+                    if shadow[index] != UMBRA:
                         
                         if object_intersects_FOV:
                             def check_intersection_with_higher_resolution(start_epoch, end_epoch, resolution=100):
@@ -101,32 +148,45 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
                                                 scale="utc", format="datetime")
                                 prop_time = (end_time - start_time).to(u.min)
                                 epochs_fine = time_range(start_time, num_values=resolution, end=end_time)
-                                jd, fr = to_julian(epochs_fine)
                                 
                                 item_observed = observed_data
                                 item_observant = created_data
-                                orb_sat_observed = Orbit.from_classical(Earth,
-                                                                        float(item_observed["SEMIMAJOR_AXIS"]) * u.km,
-                                                                        float(item_observed["ECCENTRICITY"]) * u.one,
-                                                                        float(item_observed["INCLINATION"]) * u.deg,
-                                                                        float(item_observed["RA_OF_ASC_NODE"]) * u.deg,
-                                                                        float(item_observed["ARG_OF_PERICENTER"]) * u.deg,
-                                                                        float(item_observed["TRUE_ANOMALY"]) * u.deg,
-                                                                        Time(item_observed["EPOCH"], scale='utc')
-                                                                        )
-                                orb_sat_observant = Orbit.from_classical(Earth,
-                                                                        float(item_observant["SEMIMAJOR_AXIS"]) * u.km,
-                                                                        float(item_observant["ECCENTRICITY"]) * u.one,
-                                                                        float(item_observant["INCLINATION"]) * u.deg,
-                                                                        float(item_observant["RA_OF_ASC_NODE"]) * u.deg,
-                                                                        float(item_observant["ARG_OF_PERICENTER"]) * u.deg,
-                                                                        float(item_observant["TRUE_ANOMALY"]) * u.deg,
-                                                                        Time(item_observant["EPOCH"], scale='utc')
-                                                                        )
-                                tofs_observed = (epochs_fine - orb_sat_observed.epoch).to(u.s)
-                                tofs_obsevant = (epochs_fine - orb_sat_observant.epoch).to(u.s)
-                                rr_observed, vv_observed = propagate (orb_sat_observed,epochs_fine,tofs_observed, method='SGP4', item=item_observed, start_date=start_time, prop_time=prop_time, jd=jd, fr=fr)
-                                rr_observant, vv_observant = propagate (orb_sat_observant,epochs_fine,tofs_obsevant, method='Fanocchia', item=item_observant, start_date=start_time, prop_time=prop_time, jd=jd, fr=fr)
+
+                                #Resample the continuous ephemerides of the propagation when they are available,
+                                #screening ephemerides are not accurate enough
+                                ephem_observed = (ephemerides.get(item_observed['NORAD_CAT_ID']) 
+                                                  if ephemerides and not screening else None)
+                                ephem_observant = (ephemerides.get(item_observant['NORAD_CAT_ID']) 
+                                                   if ephemerides and not screening else None)
+                                if (ephem_observed is not None and ephem_observant is not None and
+                                    ephem_observed.covers(epochs_fine) and ephem_observant.covers(epochs_fine)):
+                                    rr_observed, vv_observed = ephem_observed.sample_epochs(epochs_fine)
+                                    rr_observant, vv_observant = ephem_observant.sample_epochs(epochs_fine)
+                                else:
+                                    orb_sat_observed = Orbit.from_classical(Earth,
+                                                                            float(item_observed["SEMIMAJOR_AXIS"]) * u.km,
+                                                                            float(item_observed["ECCENTRICITY"]) * u.one,
+                                                                            float(item_observed["INCLINATION"]) * u.deg,
+                                                                            float(item_observed["RA_OF_ASC_NODE"]) * u.deg,
+                                                                            float(item_observed["ARG_OF_PERICENTER"]) * u.deg,
+                                                                            float(item_observed["TRUE_ANOMALY"]) * u.deg,
+                                                                            Time(item_observed["EPOCH"], scale='utc')
+                                                                            )
+                                    orb_sat_observant = Orbit.from_classical(Earth,
+                                                                            float(item_observant["SEMIMAJOR_AXIS"]) * u.km,
+                                                                            float(item_observant["ECCENTRICITY"]) * u.one,
+                                                                            float(item_observant["INCLINATION"]) * u.deg,
+                                                                            float(item_observant["RA_OF_ASC_NODE"]) * u.deg,
+                                                                            float(item_observant["ARG_OF_PERICENTER"]) * u.deg,
+                                                                            float(item_observant["TRUE_ANOMALY"]) * u.deg,
+                                                                            Time(item_observant["EPOCH"], scale='utc')
+                                                                            )
+                                    jd, fr = to_julian(epochs_fine)
+                                    tofs_observed = (epochs_fine - orb_sat_observed.epoch).to(u.s)
+                                    tofs_obsevant = (epochs_fine - orb_sat_observant.epoch).to(u.s)
+                                    rr_observed, vv_observed = propagate (orb_sat_observed,epochs_fine,tofs_observed, method='SGP4', item=item_observed, start_date=start_time, prop_time=prop_time, jd=jd, fr=fr)
+                                    rr_observant, vv_observant = propagate (orb_sat_observant,epochs_fine,tofs_obsevant, method='Farnocchia', item=item_observant, start_date=start_time, prop_time=prop_time, jd=jd, fr=fr)
+
                                 quater_angle_observant = float(item_observant['Quaternion Angle'])
                                 quater_axis_obsevant = ast.literal_eval(item_observant['Quaternion Vector'])
                                 orbit_axis_sys_observant, body_axis_sys_observant = get_coord_sys (rr_observant,vv_observant,quater_angle_observant,quater_axis_obsevant)
@@ -136,37 +196,47 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
                                     r_observed_observant_finer = (rr_observed[i] - 
                                         rr_observant[i]
                                         )*1000
-                                    cam_frame_finer = np.array(body_axis_sys_observant[index]) 
+                                    cam_frame_finer = np.array(body_axis_sys_observant[i]) 
                                     R_ECI_cam_finer = np.array([cam_frame_finer[0].T,cam_frame_finer[1].T,cam_frame_finer[2].T])
                                     observed_pos_cam_finer = np.dot(R_ECI_cam_finer, r_observed_observant_finer)
                                     proy_y_finer = observed_pos_cam_finer[0]*np.tan(horizontal_FOV / 2)
                                     proy_z_finer = observed_pos_cam_finer[0]*np.tan(vertical_FOV / 2)
 
                                     if (-proy_y_finer <= observed_pos_cam_finer[1] <= proy_y_finer and -proy_z_finer <= observed_pos_cam_finer[2] <= proy_z_finer):
-                                        return True, epoch_fine.utc.iso
+                                        return True, epoch_fine.utc.iso, np.linalg.norm(rr_observed[i] - rr_observant[i])
                                     elif i > 0 and check_line_intersects_fov(vertical_FOV, 
                                                                             horizontal_FOV, 
                                                                             prev_observed_pos_cam_finer, 
                                                                             observed_pos_cam_finer
                                                                             ):
-                                        result, epoch = check_intersection_with_higher_resolution(
+                                        result, epoch, distance_fine = check_intersection_with_higher_resolution(
                                             epochs_fine[i-1].utc.iso, 
                                             epoch_fine.utc.iso,
                                             resolution)
                                         if result:
-                                            return True, epoch
+                                            return True, epoch, distance_fine
                                         
                                     prev_observed_pos_cam_finer = observed_pos_cam_finer
-                                return False, None
+                                return False, None, None
                             
-                            found_intersection, intersection_epoch = check_intersection_with_higher_resolution(
-                                epochs_array[index-1], 
-                                epochs_array[index])
+                            resolution = 100
+                            if refine_resolution is not None and refine_resolution[index] > 0:
+                                resolution = refine_resolution[index]
+                            #The first step is refined towards the second one
+                            index_start = index - 1 if index > 0 else 0
+                            index_end = index if index > 0 else min(1, len(epochs_array) - 1)
+                            found_intersection, intersection_epoch, intersection_distance = check_intersection_with_higher_resolution(
+                                epochs_array[index_start], 
+                                epochs_array[index_end],
+                                resolution)
                             
                             if found_intersection:
                                 object_in_FOV = True
                                 index_observable.append(index)                            
                                 epoch_finer_[index] = intersection_epoch
+                                #Screening distances are approximate, the refined samples are not
+                                if screening:
+                                    distance_finer_[index] = intersection_distance
                                             
                         else:                         
                             observable = True
@@ -184,8 +254,9 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
             min_distance = float('inf')
             min_index = None
             for i in index_observable:
-                if distances[i] < min_distance:
-                    min_distance = distances[i]
+                distance = distances[i] if distance_finer_[i] is None else distance_finer_[i]
+                if distance < min_distance:
+                    min_distance = distance
                     min_index = i 
 
             observations.append({
@@ -204,6 +275,84 @@ def get_observable_objects(created_data, ephem_catalog_sat_data, sun_data):
     return observations, num_observations
 
 
+def get_sun_data(epochs):
+    return {
+        'name': 'Sun',
+        'coords': sun_position_teme(epochs).tolist(),
+        'epochs': epochs.utc.iso.tolist()
+    }
+
+
+def stream_observable_objects(chunks, items, map_func=map, screening=False, adaptive=False):
+    """Encounter screening over time chunks, only one chunk is kept in memory.
+
+    `chunks` yields (offset, epochs_chunk, rr, vv) as streaming.propagate_chunks
+    does for `items`. Every created satellite is screened against the
+    catalog objects chunk by chunk with get_observable_objects, and the
+    observations of a pair found in several chunks are merged. `map_func`
+    runs the created satellites of a chunk, e.g. multiprocessing.Pool().map.
+    `screening` flags secular J2 trajectories and `adaptive` a coarse grid
+    whose fast intervals are refined, see get_observable_objects.
+
+    Returns the summary and observation lists built by the app per created
+    satellite.
+
+    """
+    created = [i for i, item in enumerate(items) if item['OBJECT_ID'] == 'CREATED BY USER']
+    catalog = [i for i, item in enumerate(items) if item['OBJECT_ID'] != 'CREATED BY USER']
+    merged = {items[i]['NORAD_CAT_ID']: {} for i in created}
+
+    for offset, epochs_chunk, rr, vv in chunks:
+        sun_data = get_sun_data(epochs_chunk)
+        t_chunk = (epochs_chunk - epochs_chunk[0]).to(u.s).value
+        ephemerides = {items[i]['NORAD_CAT_ID']: ContinuousEphemeris.from_samples(epochs_chunk[0], t_chunk, rr[i], vv[i])
+                       for i in range(len(items))}
+        catalog_data = [dict(items[i], coords=rr[i]) for i in catalog]
+
+        created_data = []
+        for i in created:
+            _, body_axis_sys = get_coord_sys(rr[i], vv[i], float(items[i]['Quaternion Angle']), 
+                                             ast.literal_eval(items[i]['Quaternion Vector']))
+            created_data.append(dict(items[i], coords=rr[i], bodyaxis=body_axis_sys))
+
+        shadow = eclipse_timeline(rr[catalog], np.array(sun_data['coords']))
+        eclipse = {items[i]['NORAD_CAT_ID']: shadow[j] for j, i in enumerate(catalog)}
+        screen = partial(get_observable_objects, ephem_catalog_sat_data=catalog_data, sun_data=sun_data,
+                         ephemerides=ephemerides, adaptive=adaptive, eclipse=eclipse, screening=screening)
+        for data, (observations, _) in zip(created_data, map_func(screen, created_data)):
+            pairs = merged[data['NORAD_CAT_ID']]
+            for observation in observations:
+                observation["Index_observable"] = [index + offset for index in observation["Index_observable"]]
+                observation["Index_closest"] += offset
+                previous = pairs.get(observation["NORAD_CAT_ID_observed"])
+                if previous is None:
+                    pairs[observation["NORAD_CAT_ID_observed"]] = observation
+                    continue
+                #Chunks share their boundary sample, indices may repeat
+                previous["Index_observable"] = sorted(set(previous["Index_observable"]) | 
+                                                      set(observation["Index_observable"]))
+                if observation["Closest Distance (km)"] < previous["Closest Distance (km)"]:
+                    for key in ("Closest Distance (km)", "Time of Closest Approach", "Index_closest", 
+                                "object_intersects_FOV"):
+                        previous[key] = observation[key]
+
+    summary_data = []
+    observations = []
+    for i in created:
+        pairs = merged[items[i]['NORAD_CAT_ID']]
+        summary_data.append({
+            "OBJECT_NAME": items[i]['OBJECT_NAME'],
+            "Number of Observations": len(pairs),
+            "NORAD_CAT_ID": items[i]['NORAD_CAT_ID']
+        })
+        observations.append({
+            "NORAD_CAT_ID_observant": items[i]['NORAD_CAT_ID'],
+            "observations": list(pairs.values())
+        })
+
+    return summary_data, observations
+
+
 def check_line_intersects_fov(fov_v, fov_h, point1, point2):
     # Calculate the four corner vectors of the FOV
     up = np.array([0, 0, 1])
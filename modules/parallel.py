@@ -0,0 +1,89 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import atexit
+import os
+import threading
+
+import numpy as np
+
+from modules.propagation import sgp4_propagator_batch
+
+
+### PARALLEL PROPAGATION ###
+#Keplerian and Cowell batches already run on every core through numba threads,
+#SGP4 batches are spread over a pool of processes instead
+PROPAGATION_WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_OBJECTS = 200 #below this the pool costs more than it saves
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the persistent process pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PROPAGATION_WORKERS)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _shared_views(buf, n_sat, n_t):
+    """rr, vv and error arrays laid out one after the other in a shared buffer."""
+    size = n_sat * n_t * 3
+    rr = np.ndarray((n_sat, n_t, 3), dtype=np.float64, buffer=buf)
+    vv = np.ndarray((n_sat, n_t, 3), dtype=np.float64, buffer=buf, offset=size * 8)
+    errors = np.ndarray((n_sat, n_t), dtype=np.bool_, buffer=buf, offset=2 * size * 8)
+    return rr, vv, errors
+
+
+def _sgp4_shard(name, n_sat, n_t, start, jd, fr, items):
+    shm = SharedMemory(name=name)
+    try:
+        rr, vv, errors = _shared_views(shm.buf, n_sat, n_t)
+        end = start + len(items)
+        rr[start:end], vv[start:end], errors[start:end] = sgp4_propagator_batch(jd, fr, items)
+        del rr, vv, errors
+    finally:
+        shm.close()
+
+
+def sgp4_propagator_parallel(jd, fr, items, n_workers=None):
+    """Propagate many TLEs with SGP4, sharded over the persistent process pool.
+
+    Every worker writes its shard straight into one shared memory block, so
+    only the TLE records travel between processes. Small catalogs run in this
+    process. Returns the same arrays as propagation.sgp4_propagator_batch.
+
+    """
+    n_workers = n_workers or PROPAGATION_WORKERS
+    if n_workers < 2 or len(items) < PARALLEL_MIN_OBJECTS:
+        return sgp4_propagator_batch(jd, fr, items)
+
+    jd = np.asarray(jd, dtype=float)
+    fr = np.asarray(fr, dtype=float)
+    n_sat, n_t = len(items), len(jd)
+    shm = SharedMemory(create=True, size=n_sat * n_t * (2 * 3 * 8 + 1))
+    try:
+        bounds = np.linspace(0, n_sat, min(n_workers, n_sat) + 1).astype(int)
+        pool = get_pool()
+        futures = [pool.submit(_sgp4_shard, shm.name, n_sat, n_t, start, jd, fr, items[start:end])
+                   for start, end in zip(bounds[:-1], bounds[1:])]
+        for future in futures:
+            future.result()
+
+        rr, vv, errors = (np.array(view) for view in _shared_views(shm.buf, n_sat, n_t))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return rr, vv, errors
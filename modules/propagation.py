@@ -5,20 +5,24 @@ from poliastro.util import norm, time_range
 from datetime import datetime, timedelta
 
 import numpy as np
+import pandas as pd
 from poliastro.core.propagation.farnocchia import (
     farnocchia_coe as farnocchia_coe_fast,
-    farnocchia_rv as farnocchia_rv_fast,
+    delta_t_from_nu,
+    nu_from_delta_t,
 )
-from poliastro.core.propagation import danby
-from poliastro.core.propagation import pimienta
-from poliastro.twobody.propagation.vallado import vallado
+from poliastro.core.propagation import danby_coe
+from poliastro.core.propagation import pimienta_coe
+from poliastro.core.propagation import vallado as vallado_fast
+from poliastro.core.elements import rv2coe, coe_rotation_matrix, coe2rv
 
 from numba import njit as jit
+from numba import prange
 
 from scipy.integrate import RK23, RK45, DOP853, solve_ivp 
 
 from poliastro.constants import rho0_earth, H0_earth
-from poliastro.ephem import build_ephem_interpolant
+from poliastro.ephem import Ephem
 from astropy.coordinates import solar_system_ephemeris
 from poliastro.core.perturbations import (J2_perturbation,
                                           atmospheric_drag_exponential,
@@ -26,8 +30,32 @@ from poliastro.core.perturbations import (J2_perturbation,
                                           radiation_pressure
                                           )
 
-from sgp4.api import Satrec
-from sgp4.api import jday
+from modules.forces import (func_twobody_fast,
+                            func_twobody_w_s_pert_fast,
+                            func_twobody_w_pert_fast,
+                            ephem_position,
+                            shift_ephem,
+                            J2_EARTH,
+                            R_EARTH
+                            )
+
+from modules.ephemeris import ContinuousEphemeris
+
+from sgp4.api import Satrec, SatrecArray
+
+from collections import OrderedDict
+import threading
+import zlib
+
+SATREC_CACHE_SIZE = 50000
+_satrec_cache = OrderedDict()
+_satrec_cache_lock = threading.Lock()
+
+EPHEM_NODE_STEP = 3600 #seconds between Moon/Sun ephemeris nodes
+EPHEM_PAD = 60 #seconds of margin on both ends of the window
+EPHEM_CACHE_SIZE = 16
+_ephem_cache = OrderedDict()
+_ephem_cache_lock = threading.Lock()
 
 def func_twobody(t0, u_, k):
     """Differential equation for the initial value two body problem.
@@ -81,7 +109,46 @@ def func_twobody_w_s_pert(t0, u_, k, A_over_m):
     return du_kep + du_ad_J2 + du_ad_atm
 
 
-def func_twobody_w_pert(t0, u_, k, start_date, prop_time, A_over_m, epoch):
+def get_third_body_ephem(start, end):
+    """Return Moon and Sun ephemerides sampled over a propagation window.
+
+    The result is a tuple (t_first, dt, moon_nodes, sun_nodes) of
+    Earth-centered positions (km) on a uniform grid, with node times in
+    seconds since `start`, evaluated with forces.ephem_position. It is built
+    once per window and kept in a small LRU cache, so every satellite
+    propagated over the same window shares it.
+
+    """
+    key = (Time(start).utc.isot, Time(end).utc.isot)
+    with _ephem_cache_lock:
+        if key in _ephem_cache:
+            _ephem_cache.move_to_end(key)
+            return _ephem_cache[key]
+
+    solar_system_ephemeris.set("de432s")
+    duration = (Time(end) - Time(start)).to(u.s).value + 2 * EPHEM_PAD
+    num_values = max(20, int(np.ceil(duration / EPHEM_NODE_STEP)) + 1)
+    epochs_moon_sun = time_range(Time(start) - EPHEM_PAD * u.s, num_values=num_values, 
+                                 end=Time(end) + EPHEM_PAD * u.s)
+    moon_nodes = Ephem.from_body(Moon, epochs_moon_sun, attractor=Earth).sample()
+    sun_nodes = Ephem.from_body(Sun, epochs_moon_sun, attractor=Earth).sample()
+    ephem = (-float(EPHEM_PAD),
+             duration / (num_values - 1),
+             np.ascontiguousarray(moon_nodes.xyz.to(u.km).value.T),
+             np.ascontiguousarray(sun_nodes.xyz.to(u.km).value.T))
+
+    with _ephem_cache_lock:
+        _ephem_cache[key] = ephem
+        while len(_ephem_cache) > EPHEM_CACHE_SIZE:
+            _ephem_cache.popitem(last=False)
+
+    return ephem
+
+def func_twobody_w_pert(t0, u_, k, A_over_m, ephem):
+
+    t_first, dt, moon_nodes, sun_nodes = ephem
+    body_r = lambda t: ephem_position(t, t_first, dt, moon_nodes)
+    body_s = lambda t: ephem_position(t, t_first, dt, sun_nodes)
 
     x, y, z, vx, vy, vz = u_
     r3 = (x**2 + y**2 + z**2) ** 1.5
@@ -112,12 +179,6 @@ def func_twobody_w_pert(t0, u_, k, start_date, prop_time, A_over_m, epoch):
     du_ad_atm = np.array([0, 0, 0, ax, ay, az])
 
     #3rd body perturbation
-    solar_system_ephemeris.set("de432s")
-    epochs_moon_sun = time_range(epoch,
-                            num_values = 20,  # Match the main step count
-                            end = start_date + (prop_time)/1440 * u.day
-                            )
-    body_r = build_ephem_interpolant(Moon,epochs_moon_sun)
     ax, ay, az = third_body(
         t0,
         u_,
@@ -128,7 +189,6 @@ def func_twobody_w_pert(t0, u_, k, start_date, prop_time, A_over_m, epoch):
     du_ad_3rd = np.array([0, 0, 0, ax, ay, az])  
 
     #radiation pressure perturbation
-    body_s = build_ephem_interpolant(Sun,epochs_moon_sun)
     ax, ay, az = radiation_pressure(
         t0,
         u_,
@@ -143,7 +203,7 @@ def func_twobody_w_pert(t0, u_, k, start_date, prop_time, A_over_m, epoch):
     
     return du_kep + du_ad_J2 + du_ad_atm + du_ad_3rd + du_ad_rad
 
-def cowell(k, r, v, tofs, RK_integrator, rtol=1e-11, *, events=None, f=func_twobody):
+def cowell(k, r, v, tofs, RK_integrator, rtol=1e-11, *, events=None, f=func_twobody_fast, return_sol=False):
     x, y, z = r
     vx, vy, vz = v
 
@@ -186,17 +246,15 @@ def cowell(k, r, v, tofs, RK_integrator, rtol=1e-11, *, events=None, f=func_twob
             # FIXME: Here last_t has units, but tofs don't
             tofs = [tof for tof in tofs if tof < last_t] + [last_t]
 
-    rrs = []
-    vvs = []
-    for i in range(len(tofs)):
-        t = tofs[i]
-        y = result.sol(t)
-        rrs.append(y[:3])
-        vvs.append(y[3:])
+    y = result.sol(np.asarray(tofs, dtype=float))
+    rrs = y[:3].T
+    vvs = y[3:].T
 
+    if return_sol:
+        return rrs, vvs, result.sol
     return rrs, vvs
 
-def cowell_w_s_pert(k, r, v, tofs, RK_integrator, span, mass, rtol=1e-11, *, events=None, f=func_twobody_w_s_pert):
+def cowell_w_s_pert(k, r, v, tofs, RK_integrator, span, mass, rtol=1e-11, *, events=None, f=func_twobody_w_s_pert_fast, return_sol=False):
     x, y, z = r
     vx, vy, vz = v
 
@@ -240,18 +298,16 @@ def cowell_w_s_pert(k, r, v, tofs, RK_integrator, span, mass, rtol=1e-11, *, eve
             # FIXME: Here last_t has units, but tofs don't
             tofs = [tof for tof in tofs if tof < last_t] + [last_t]
 
-    rrs = []
-    vvs = []
-    for i in range(len(tofs)):
-        t = tofs[i]
-        y = result.sol(t)
-        rrs.append(y[:3])
-        vvs.append(y[3:])
+    y = result.sol(np.asarray(tofs, dtype=float))
+    rrs = y[:3].T
+    vvs = y[3:].T
 
+    if return_sol:
+        return rrs, vvs, result.sol
     return rrs, vvs
 
 
-def cowell_w_pert(k, r, v, tofs, RK_integrator, initial_orbit, span, mass, start_date, prop_time, rtol=1e-11, *, events=None, f=func_twobody_w_pert):
+def cowell_w_pert(k, r, v, tofs, RK_integrator, initial_orbit, span, mass, start_date, prop_time, rtol=1e-11, *, events=None, f=func_twobody_w_pert_fast, ephem_window=None, return_sol=False):
     x, y, z = r
     vx, vy, vz = v
 
@@ -268,11 +324,18 @@ def cowell_w_pert(k, r, v, tofs, RK_integrator, initial_orbit, span, mass, start
     A_over_m = span*span/mass
     epoch = Time(initial_orbit.epoch, scale='tdb')
 
+    #Moon and Sun ephemerides are built once per window, the RHS only evaluates them
+    if ephem_window is None:
+        ephem_window = (min(epoch, Time(start_date)), Time(start_date) + u.Quantity(prop_time, u.min))
+    window_start, window_end = ephem_window
+    t_offset = (epoch - Time(window_start)).to(u.s).value
+    ephem = shift_ephem(get_third_body_ephem(window_start, window_end), t_offset)
+
     result = solve_ivp(
         f,
         (0, max(tofs)),
         u0,
-        args=(k, start_date, prop_time, A_over_m, epoch),
+        args=(k, A_over_m, ephem),
         rtol=rtol,
         atol=1e-12,
         method=RK_integrator,
@@ -297,95 +360,452 @@ def cowell_w_pert(k, r, v, tofs, RK_integrator, initial_orbit, span, mass, start
             # FIXME: Here last_t has units, but tofs don't
             tofs = [tof for tof in tofs if tof < last_t] + [last_t]
 
-    rrs = []
-    vvs = []
-    for i in range(len(tofs)):
-        t = tofs[i]
-        y = result.sol(t)
-        rrs.append(y[:3])
-        vvs.append(y[3:])
+    y = result.sol(np.asarray(tofs, dtype=float))
+    rrs = y[:3].T
+    vvs = y[3:].T
 
+    if return_sol:
+        return rrs, vvs, result.sol
     return rrs, vvs
 
-def sgp4_propagator(jd,fr, item):
+def get_satrec(item):
+    """Return the parsed Satrec of a catalog record, parsing its TLE only once.
+
+    Parsed objects are kept in a process-wide LRU cache of at most
+    SATREC_CACHE_SIZE entries, keyed by NORAD ID and a CRC32 checksum of both
+    TLE lines, so a new element set for the same object is parsed again.
+
+    """
     s = item['TLE_LINE1']
     t = item['TLE_LINE2']
+    key = (item.get('NORAD_CAT_ID'), zlib.crc32(f"{s}\n{t}".encode()))
+
+    with _satrec_cache_lock:
+        satellite = _satrec_cache.get(key)
+        if satellite is not None:
+            _satrec_cache.move_to_end(key)
+            return satellite
+
     satellite = Satrec.twoline2rv(s, t)
 
+    with _satrec_cache_lock:
+        _satrec_cache[key] = satellite
+        _satrec_cache.move_to_end(key)
+        while len(_satrec_cache) > SATREC_CACHE_SIZE:
+            _satrec_cache.popitem(last=False)
+
+    return satellite
+
+def clear_satrec_cache():
+    with _satrec_cache_lock:
+        _satrec_cache.clear()
+
+TWOBODY_METHODS = {'Farnocchia': 0, 'Danby': 1, 'Pimienta': 2, 'Vallado': 3}
+
+@jit(parallel=True)
+def _twobody_batch(k, r0, v0, tofs, method_id, numiter, out):
+    n_orbits = r0.shape[0]
+    n_t = tofs.shape[1]
+
+    for i in prange(n_orbits):
+        if method_id == 3:
+            for j in range(n_t):
+                f, g, fdot, gdot = vallado_fast(k, r0[i], v0[i], tofs[i, j], numiter)
+                for m in range(3):
+                    out[i, j, m] = f * r0[i, m] + g * v0[i, m]
+                    out[i, j, 3 + m] = fdot * r0[i, m] + gdot * v0[i, m]
+            continue
+
+        #Orbit shape and orientation are constant, only the anomaly changes
+        p, ecc, inc, raan, argp, nu0 = rv2coe(k, r0[i], v0[i])
+        rot = coe_rotation_matrix(inc, raan, argp)
+        sqrt_k_p = np.sqrt(k / p)
+        q = p / (1 + ecc)
+        delta_t0 = delta_t_from_nu(nu0, ecc, k, q)
+
+        for j in range(n_t):
+            if method_id == 0:
+                nu = nu_from_delta_t(delta_t0 + tofs[i, j], ecc, k, q)
+            elif method_id == 1:
+                nu = danby_coe(k, p, ecc, inc, raan, argp, nu0, tofs[i, j])
+            else:
+                nu = pimienta_coe(k, p, ecc, inc, raan, argp, nu0, tofs[i, j])
+
+            cos_nu = np.cos(nu)
+            sin_nu = np.sin(nu)
+            r_norm = p / (1 + ecc * cos_nu)
+            x_pqw = r_norm * cos_nu
+            y_pqw = r_norm * sin_nu
+            vx_pqw = -sqrt_k_p * sin_nu
+            vy_pqw = sqrt_k_p * (ecc + cos_nu)
+            for m in range(3):
+                out[i, j, m] = rot[m, 0] * x_pqw + rot[m, 1] * y_pqw
+                out[i, j, 3 + m] = rot[m, 0] * vx_pqw + rot[m, 1] * vy_pqw
+
+    return out
+
+def propagate_twobody_batch(k, r0, v0, tofs, method='Farnocchia', numiter=10, out=None):
+    """Propagate many Keplerian orbits over many times of flight at once.
+
+    Parameters
+    ----------
+    k : float
+        Standard gravitational parameter (km3/s2).
+    r0, v0 : numpy.ndarray
+        Initial positions (km) and velocities (km/s), shape (N_orbit, 3).
+    tofs : numpy.ndarray
+        Times of flight (s), either a shared grid of shape (N_t,) or one row
+        per orbit of shape (N_orbit, N_t).
+    method : str
+        One of the keys of TWOBODY_METHODS.
+    numiter : int
+        Number of iterations of the Vallado solver.
+    out : numpy.ndarray, optional
+        Preallocated float64 output of shape (N_orbit, N_t, 6).
+
+    Returns
+    -------
+    out : numpy.ndarray
+        States [x, y, z, vx, vy, vz] of shape (N_orbit, N_t, 6).
+
+    """
+    r0 = np.ascontiguousarray(r0, dtype=np.float64).reshape(-1, 3)
+    v0 = np.ascontiguousarray(v0, dtype=np.float64).reshape(-1, 3)
+    tofs = np.asarray(tofs, dtype=np.float64)
+    if tofs.ndim == 1:
+        #A writeable copy, read-only views would compile a second specialization
+        tofs = np.repeat(tofs[None, :], r0.shape[0], axis=0)
+    tofs = np.ascontiguousarray(tofs)
+
+    if out is None:
+        out = np.empty((r0.shape[0], tofs.shape[1], 6))
+
+    return _twobody_batch(k, r0, v0, tofs, TWOBODY_METHODS[method], numiter, out)
+
+@jit(parallel=True)
+def coe2rv_batch(k, a, ecc, inc, raan, argp, nu):
+    """Compiled classical elements (km, rad) to positions and velocities, shape (N, 3)."""
+    n_orbits = a.shape[0]
+    r = np.empty((n_orbits, 3))
+    v = np.empty((n_orbits, 3))
+    for i in prange(n_orbits):
+        rv = coe2rv(k, a[i] * (1 - ecc[i] ** 2), ecc[i], inc[i], raan[i], argp[i], nu[i])
+        r[i] = rv[0]
+        v[i] = rv[1]
+    return r, v
+
+def elements_to_states(elements, reference_epoch):
+    """Initial states of many catalog objects without building an Orbit for each.
+
+    Parameters
+    ----------
+    elements : pandas.DataFrame or list of dict
+        Catalog records with the SEMIMAJOR_AXIS (km), ECCENTRICITY,
+        INCLINATION, RA_OF_ASC_NODE, ARG_OF_PERICENTER, TRUE_ANOMALY (deg) and
+        EPOCH (UTC) columns, as read by Orbit.from_classical in the app.
+    reference_epoch : astropy.time.Time
+        Origin of the returned epochs.
+
+    Returns
+    -------
+    r0, v0 : numpy.ndarray
+        Positions (km) and velocities (km/s) at the object epochs, shape (N, 3).
+    t_epoch : numpy.ndarray
+        Object epochs in seconds since `reference_epoch`, shape (N,).
+
+    """
+    elements = elements if isinstance(elements, pd.DataFrame) else pd.DataFrame(list(elements))
+    if len(elements) == 0:
+        return np.empty((0, 3)), np.empty((0, 3)), np.empty(0)
+
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    column = lambda key: elements[key].to_numpy(dtype=np.float64)
+    r0, v0 = coe2rv_batch(k, column("SEMIMAJOR_AXIS"), column("ECCENTRICITY"),
+                          np.radians(column("INCLINATION")), np.radians(column("RA_OF_ASC_NODE")),
+                          np.radians(column("ARG_OF_PERICENTER")), np.radians(column("TRUE_ANOMALY")))
+    t_epoch = (Time(list(elements["EPOCH"]), scale='utc') - Time(reference_epoch)).to(u.s).value
+
+    return r0, v0, t_epoch
+
+SECULAR_J2_METHOD = 'Secular J2'
+
+@jit
+def _secular_drag_coefficients(n, a0, e, cos_i, argp, bstar):
+    """Secular drag coefficients of SGP4 (sgp4init), with `n` in rad/s and `a0` in Earth radii."""
+    perigee = (a0 * (1 - e) - 1) * R_EARTH
+    s4, qzms24 = 78.0, ((120 - 78) / R_EARTH) ** 4
+    if perigee < 156:
+        s4 = perigee - 78 if perigee >= 98 else 20.0
+        qzms24 = ((120 - s4) / R_EARTH) ** 4
+    s4 = s4 / R_EARTH + 1
+    tsi = 1 / (a0 - s4)
+    eta = a0 * e * tsi
+    etasq, eeta = eta * eta, e * eta
+    psisq = abs(1 - etasq)
+    coef = qzms24 * tsi ** 4
+    coef1 = coef / psisq ** 3.5
+    con41 = 3 * cos_i ** 2 - 1
+    C1 = bstar * coef1 * n * (a0 * (1 + 1.5 * etasq + eeta * (4 + etasq)) +
+                              0.375 * J2_EARTH * tsi / psisq * con41 * (8 + 3 * etasq * (8 + etasq)))
+    C4 = 2 * n * coef1 * a0 * (1 - e * e) * (eta * (2 + 0.5 * etasq) + e * (0.5 + 2 * etasq) -
+                                             J2_EARTH * tsi / (a0 * psisq) *
+                                             (-3 * con41 * (1 - 2 * eeta + etasq * (1.5 - 0.5 * eeta)) +
+                                              0.75 * (1 - cos_i ** 2) * (2 * etasq - eeta * (1 + etasq)) *
+                                              np.cos(2 * argp)))
+
+    #Higher order terms, dropped by SGP4 below 220 km of perigee
+    D2 = D3 = D4 = 0.0
+    if perigee >= 220:
+        D2 = 4 * a0 * tsi * C1 * C1
+        temp = D2 * tsi * C1 / 3
+        D3 = (17 * a0 + s4) * temp
+        D4 = 0.5 * temp * a0 * tsi * (221 * a0 + 31 * s4) * C1
+    t3cof = D2 + 2 * C1 * C1
+    t4cof = 0.25 * (3 * D3 + C1 * (12 * D2 + 10 * C1 * C1))
+    t5cof = 0.2 * (3 * D4 + 12 * C1 * D3 + 6 * D2 * D2 + 15 * C1 * C1 * (2 * D2 + C1 * C1))
+    return C1, bstar * C4, D2, D3, D4, t3cof, t4cof, t5cof
+
+@jit(parallel=True)
+def _secular_j2_batch(k, a, ecc, inc, raan, argp, nu, bstar, tofs, out):
+    for i in prange(a.shape[0]):
+        e = ecc[i]
+        beta2 = 1 - e * e
+        beta = np.sqrt(beta2)
+        cos_i, sin_i = np.cos(inc[i]), np.sin(inc[i])
+
+        #Brouwer mean motion from the Kozai mean motion of the catalog semimajor axis, as SGP4 does
+        n_kozai = np.sqrt(k / a[i] ** 3)
+        d1 = 0.75 * J2_EARTH * (3 * cos_i ** 2 - 1) / (beta * beta2)
+        a1 = a[i] / R_EARTH
+        delta = d1 / (a1 * a1)
+        a0 = a1 * (1 - delta * delta - delta * (1 / 3 + 134 * delta * delta / 81))
+        n = n_kozai / (1 + d1 / (a0 * a0))
+        a_mean = (k / (n * n)) ** (1 / 3)
+
+        #Secular rates of the node, the perigee and the mean anomaly
+        j2_term = 0.75 * n * J2_EARTH * (R_EARTH / (a_mean * beta2)) ** 2
+        raan_rate = -2 * j2_term * cos_i
+        argp_rate = j2_term * (5 * cos_i ** 2 - 1)
+        M_rate = n + j2_term * beta * (3 * cos_i ** 2 - 1)
+
+        E0 = 2 * np.arctan(np.sqrt((1 - e) / (1 + e)) * np.tan(nu[i] / 2))
+        M0 = E0 - e * np.sin(E0)
+
+        #Drag (B*) shrinks the orbit and accelerates the mean anomaly, times in seconds
+        C1, C4, D2, D3, D4, t3cof, t4cof, t5cof = _secular_drag_coefficients(n, a_mean / R_EARTH, e, cos_i,
+                                                                              argp[i], bstar[i])
+        node_drag = 3.5 * beta2 * raan_rate * C1
+
+        for j in range(tofs.shape[1]):
+            t = tofs[i, j]
+            t2 = t * t
+            a_t = a_mean * (1 - C1 * t - D2 * t2 - D3 * t2 * t - D4 * t2 * t2) ** 2
+            e = max(ecc[i] - C4 * t, 1e-6)
+            beta = np.sqrt(1 - e * e)
+            sqrt_ka = np.sqrt(k * a_t)
+            M = M0 + M_rate * t + n * (1.5 * C1 * t2 + t3cof * t2 * t + t2 * t2 * (t4cof + t * t5cof))
+            M = (M + np.pi) % (2 * np.pi) - np.pi
+            E = M + e * np.sin(M)
+            for _ in range(20):
+                dE = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+                E -= dE
+                if abs(dE) < 1e-12:
+                    break
+            cos_E, sin_E = np.cos(E), np.sin(E)
+            r = a_t * (1 - e * cos_E)
+            x, y = a_t * (cos_E - e), a_t * beta * sin_E
+            vx, vy = -sqrt_ka / r * sin_E, sqrt_ka * beta / r * cos_E
+
+            #Perifocal to inertial with the drifting node and perigee
+            node = raan[i] + raan_rate * t + node_drag * t2
+            cos_O, sin_O = np.cos(node), np.sin(node)
+            cos_w, sin_w = np.cos(argp[i] + argp_rate * t), np.sin(argp[i] + argp_rate * t)
+            P = (cos_O * cos_w - sin_O * sin_w * cos_i, sin_O * cos_w + cos_O * sin_w * cos_i, sin_w * sin_i)
+            Q = (-cos_O * sin_w - sin_O * cos_w * cos_i, -sin_O * sin_w + cos_O * cos_w * cos_i, cos_w * sin_i)
+            for m in range(3):
+                out[i, j, m] = x * P[m] + y * Q[m]
+                out[i, j, 3 + m] = vx * P[m] + vy * Q[m]
+    return out
+
+def propagate_secular_j2_batch(k, a, ecc, inc, raan, argp, nu, tofs, out=None, bstar=None):
+    """Propagate many elliptic orbits with the secular J2 drift of the node, perigee and mean anomaly.
+
+    The elements are taken as mean elements, with the semimajor axis of the
+    catalog (Kozai) mean motion: the Brouwer mean motion is recovered as in
+    SGP4, then the node, the perigee and the mean anomaly move at the first
+    order J2 rates, without any periodic term. With `bstar` the secular drag
+    terms of SGP4 shrink the orbit, decay the eccentricity and accelerate
+    the mean anomaly (the B* drag term; SGP4 does not use ndot either). It costs about as much as the Keplerian propagators
+    and is meant for screening, see observability.get_observable_objects.
+
+    Parameters
+    ----------
+    k : float
+        Standard gravitational parameter (km3/s2).
+    a, ecc, inc, raan, argp, nu : numpy.ndarray
+        Classical elements (km, rad) at each orbit epoch, shape (N_orbit,).
+    tofs : numpy.ndarray
+        Times of flight from each orbit epoch (s), shape (N_t,) or (N_orbit, N_t).
+    out : numpy.ndarray, optional
+        Preallocated float64 output of shape (N_orbit, N_t, 6).
+    bstar : numpy.ndarray, optional
+        B* drag terms of the TLEs (1/Earth radii), shape (N_orbit,); no drag by default.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        States [x, y, z, vx, vy, vz] of shape (N_orbit, N_t, 6).
+
+    """
+    a, ecc, inc, raan, argp, nu = (np.ascontiguousarray(np.atleast_1d(element), dtype=np.float64)
+                                   for element in (a, ecc, inc, raan, argp, nu))
+    bstar = np.zeros(a.shape[0]) if bstar is None else np.array(np.broadcast_to(bstar, a.shape), dtype=np.float64)
+    tofs = np.asarray(tofs, dtype=np.float64)
+    if tofs.ndim == 1:
+        #A writeable copy, read-only views would compile a second specialization
+        tofs = np.repeat(tofs[None, :], a.shape[0], axis=0)
+    tofs = np.ascontiguousarray(tofs)
+
+    if out is None:
+        out = np.empty((a.shape[0], tofs.shape[1], 6))
+
+    return _secular_j2_batch(k, a, ecc, inc, raan, argp, nu, bstar, tofs, out)
+
+def secular_j2_states(elements, reference_epoch, t_grid):
+    """States (N, N_t, 6) of catalog records over `t_grid` seconds since `reference_epoch`, see elements_to_states."""
+    elements = elements if isinstance(elements, pd.DataFrame) else pd.DataFrame(list(elements))
+    if len(elements) == 0:
+        return np.empty((0, len(t_grid), 6))
+
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    column = lambda key: elements[key].to_numpy(dtype=np.float64)
+    t_epoch = (Time(list(elements["EPOCH"]), scale='utc') - Time(reference_epoch)).to(u.s).value
+    return propagate_secular_j2_batch(k, column("SEMIMAJOR_AXIS"), column("ECCENTRICITY"),
+                                      np.radians(column("INCLINATION")), np.radians(column("RA_OF_ASC_NODE")),
+                                      np.radians(column("ARG_OF_PERICENTER")), np.radians(column("TRUE_ANOMALY")),
+                                      np.asarray(t_grid)[None, :] - t_epoch[:, None],
+                                      bstar=np.array([get_bstar(record) for record in elements.to_dict('records')]))
+
+def get_bstar(item):
+    """B* drag term (1/Earth radii) of a catalog record, from its BSTAR column or its TLE, 0 without either."""
+    bstar = item.get('BSTAR')
+    if bstar is not None and np.isfinite(float(bstar)):
+        return float(bstar)
+    if isinstance(item.get('TLE_LINE1'), str) and isinstance(item.get('TLE_LINE2'), str):
+        return get_satrec(item).bstar
+    return 0.0
+
+def screening_states(items, reference_epoch, t_grid):
+    """States (N, N_t, 6) for the secular J2 screening: catalog records move with the secular
+    J2 rates, satellites created by the user with Farnocchia, as in the confirmation pass."""
+    created = np.array([item['OBJECT_ID'] == 'CREATED BY USER' for item in items], dtype=bool)
+    states = np.empty((len(items), len(t_grid), 6))
+    if created.any():
+        k = Earth.k.to(u.km**3 / u.s**2).value
+        r0, v0, t_epoch = elements_to_states([item for item, c in zip(items, created) if c], reference_epoch)
+        states[created] = propagate_twobody_batch(k, r0, v0, np.asarray(t_grid)[None, :] - t_epoch[:, None],
+                                                  method='Farnocchia')
+    if (~created).any():
+        states[~created] = secular_j2_states([item for item, c in zip(items, created) if not c],
+                                             reference_epoch, t_grid)
+    return states
+
+def sgp4_propagator(jd,fr, item):
+    satellite = get_satrec(item)
+
     e, rr, vv = satellite.sgp4_array(jd, fr)
 
     return rr, vv
 
+def sgp4_propagator_batch(jd, fr, items):
+    """Propagate many TLEs over one epoch grid in a single SGP4 call.
+
+    Parameters
+    ----------
+    jd, fr : numpy.ndarray
+        Two-part Julian dates of the epoch grid, shape (N_t,).
+    items : list of dict
+        Catalog records holding 'TLE_LINE1' and 'TLE_LINE2'.
+
+    Returns
+    -------
+    rr, vv : numpy.ndarray
+        TEME positions (km) and velocities (km/s), shape (N_sat, N_t, 3).
+    error_mask : numpy.ndarray
+        Boolean array of shape (N_sat, N_t), True where SGP4 returned a
+        non-zero error code.
+
+    """
+    jd = np.asarray(jd, dtype=float)
+    fr = np.asarray(fr, dtype=float)
+    if len(items) == 0:
+        empty = np.empty((0, len(jd), 3))
+        return empty, empty.copy(), np.zeros((0, len(jd)), dtype=bool)
+
+    satellites = SatrecArray([get_satrec(item) for item in items])
+    e, rr, vv = satellites.sgp4(jd, fr)
 
-def propagate (initial_orbit, epochs, tofs, method = 'Farnocchia', item=None, start_date=None, prop_time=None, jd=None, fr =None):
+    return rr, vv, e != 0
+
+
+def propagate (initial_orbit, epochs, tofs, method = 'Farnocchia', item=None, start_date=None, prop_time=None, jd=None, fr =None, ephem_window=None, return_ephem=False, force_model=None):
 
     r0 = initial_orbit.r.to(u.km).value
     v0 = initial_orbit.v.to(u.km / u.s).value
 
     k = Earth.k.to(u.km**3 / u.s**2).value
 
-    # COWELL
+    tofs = u.Quantity(tofs, u.s).value
+    sol = None
+
+    # COWELL, a forces.ForceModel replaces the fixed set of terms of the method
+    if force_model is not None:
+        force_model = force_model.for_orbit(k, r0, v0)
     if method == 'Cowell (wo/perturbations)':
-        tofs = tofs.to(u.s).value
-        rr_cowell, vv_cowell = cowell(k, r0, v0, tofs, "DOP853")
-        rr_cowell = np.array(rr_cowell)
-        vv_cowell = np.array(vv_cowell)
-        return rr_cowell, vv_cowell
-    if method == 'Cowell (w/ some perturbations)':
-        tofs = tofs.to(u.s).value
-        rr_cowell, vv_cowell = cowell_w_s_pert(k, r0, v0, tofs, "DOP853", item['span'], item['mass'])
-        rr_cowell = np.array(rr_cowell)
-        vv_cowell = np.array(vv_cowell)
-        return rr_cowell, vv_cowell
-    if method == 'Cowell (w/ perturbations)':
-        tofs = tofs.to(u.s).value
-        rr_cowell, vv_cowell = cowell_w_pert(k, r0, v0, tofs, "DOP853", initial_orbit, item['span'], item['mass'], start_date, prop_time)
-        rr_cowell = np.array(rr_cowell)
-        vv_cowell = np.array(vv_cowell)
-        return rr_cowell, vv_cowell
-
-    # FARNOCHIA
-    if method == 'Farnocchia':
-        results = np.array([farnocchia_rv_fast(k, r0, v0 , tof) for tof in tofs])
-        rr_farnocchia = results[:, 0]
-        vv_farnocchia = results[:, 1]
-        return rr_farnocchia, vv_farnocchia
-    
-    #DANBY
-    if method == 'Danby':
-        results = np.array([danby(k, r0, v0 , tof) for tof in tofs])
-        rr_danby = results[:, 0]
-        vv_danby = results[:, 1]
-        return rr_danby, vv_danby
-
-    #PIMIENTA
-    if method == 'Pimienta':
-        results = np.array([pimienta(k, r0, v0 , tof) for tof in tofs])
-        rr_pimienta = results[:, 0]
-        vv_pimienta = results[:, 1]
-        return rr_pimienta, vv_pimienta
-    
-    #VALLADO
-    if method == 'Vallado':
-        numiter = 10
-        results = np.array([vallado(k, r0, v0, tof, numiter=numiter) for tof in tofs])
-        rr_vallado = results[:, 0]
-        vv_vallado = results[:, 1]
-        return rr_vallado, vv_vallado
-
-    if method == 'SGP4':
+        f = func_twobody_fast if force_model is None else force_model.func
+        rr, vv, sol = cowell(k, r0, v0, tofs, "DOP853", f=f, return_sol=True)
+    elif method == 'Cowell (w/ some perturbations)':
+        f = func_twobody_w_s_pert_fast if force_model is None else force_model.func
+        rr, vv, sol = cowell_w_s_pert(k, r0, v0, tofs, "DOP853", item['span'], item['mass'], f=f, return_sol=True)
+    elif method == 'Cowell (w/ perturbations)':
+        f = func_twobody_w_pert_fast if force_model is None else force_model.func
+        rr, vv, sol = cowell_w_pert(k, r0, v0, tofs, "DOP853", initial_orbit, item['span'], item['mass'], start_date, prop_time, 
+                                    ephem_window=ephem_window, f=f, return_sol=True)
+
+    # MEAN ELEMENTS WITH SECULAR J2
+    elif method == SECULAR_J2_METHOD:
+        a, ecc, inc, raan, argp, nu = (initial_orbit.a.to(u.km).value, initial_orbit.ecc.value,
+                                       initial_orbit.inc.to(u.rad).value, initial_orbit.raan.to(u.rad).value,
+                                       initial_orbit.argp.to(u.rad).value, initial_orbit.nu.to(u.rad).value)
+        results = propagate_secular_j2_batch(k, a, ecc, inc, raan, argp, nu, tofs,
+                                             bstar=get_bstar(item) if item is not None else None)[0]
+        rr, vv = results[:, :3], results[:, 3:]
+
+    # FARNOCHIA, DANBY, PIMIENTA, VALLADO
+    elif method in TWOBODY_METHODS:
+        results = propagate_twobody_batch(k, r0, v0, tofs, method=method)[0]
+        rr, vv = results[:, :3], results[:, 3:]
+
+    elif method == 'SGP4':
         if item ['OBJECT_ID'] == 'CREATED BY USER':
-            results = np.array([farnocchia_rv_fast(k, r0, v0 , tof) for tof in tofs])
-            rr_farnocchia = results[:, 0]
-            vv_farnocchia = results[:, 1]
-            return rr_farnocchia, vv_farnocchia            
+            results = propagate_twobody_batch(k, r0, v0, tofs, method='Farnocchia')[0]
+            rr, vv = results[:, :3], results[:, 3:]
         else:
             rr_sgp4, vv_sgp4 = sgp4_propagator(jd, fr, item)
-            rr_sgp4 = np.array(rr_sgp4)
-            vv_sgp4 = np.array(vv_sgp4)
-            return rr_sgp4,vv_sgp4
-    
+            rr = np.array(rr_sgp4)
+            vv = np.array(vv_sgp4)
+
+    else:
+        return None
+
+    if return_ephem:
+        if sol is not None:
+            ephem = ContinuousEphemeris.from_dense_output(initial_orbit.epoch, sol, tofs)
+        else:
+            ephem = ContinuousEphemeris.from_samples(initial_orbit.epoch, tofs, rr, vv)
+        return rr, vv, ephem
 
+    return rr, vv
 
 
 def spherical_to_cartesian(r, ra, dec):
@@ -397,24 +817,25 @@ def spherical_to_cartesian(r, ra, dec):
     return x, y, z
 
 def to_julian (epochs):
-    jd=[]
-    fr=[]
-    for epoch in epochs:
-        year = epoch.datetime.year
-        month = epoch.datetime.month
-        day = epoch.datetime.day
-        hour = epoch.datetime.hour
-        minute = epoch.datetime.minute
-        second = epoch.datetime.second
-        microsecond = epoch.datetime.microsecond
-        second_fraction = microsecond / 1_000_000
-        second_with_fraction = second + second_fraction
-        
-        jd_, fr_ = jday(year, month, day, hour, minute, second_with_fraction)
-        
-        jd.append(jd_)
-        fr.append(fr_)
-    
-    jd = np.array(jd)
-    fr = np.array(fr)
+    """Two-part UTC Julian dates of `epochs` in the SGP4 convention.
+
+    jd is the Julian date of the preceding midnight and fr the fraction of
+    the day, as sgp4.api.jday returns them, taken straight from the
+    normalized two-part JD of the Time object (jd1 integer, |jd2| <= 0.5).
+
+    """
+    utc = Time(epochs).utc
+    jd1 = np.atleast_1d(utc.jd1)
+    jd2 = np.atleast_1d(utc.jd2)
+
+    days = np.floor(jd2 + 0.5)
+    jd = jd1 - 0.5 + days
+    fr = jd2 + 0.5 - days
     return jd, fr
+
+def julian_range(start, step, num_values):
+    """SGP4 jd, fr of a uniform grid of `num_values` epochs every `step` seconds from `start`."""
+    jd0, fr0 = to_julian(Time(start))
+    fr = fr0[0] + np.arange(num_values) * (u.Quantity(step, u.s).value / 86400)
+    days = np.floor(fr)
+    return jd0[0] + days, fr - days
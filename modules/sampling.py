@@ -0,0 +1,159 @@
+from astropy import units as u
+from poliastro.bodies import Earth
+
+import numpy as np
+
+
+### ADAPTIVE TIME SAMPLING ###
+SAMPLES_PER_ORBIT = 180 #coarse grid, 2 degrees of anomaly for the fastest object
+MIN_STEP = 6 #s, the uniform grid of the app
+MAX_STEP = 300 #s
+FOV_FRACTION = 0.5 #largest line of sight sweep per refined step, in FOVs
+MAX_REFINEMENT = 1000 #samples per refined interval
+
+
+def coarse_num_values(items, prop_time):
+    """Number of epochs of the common coarse grid over `prop_time` minutes.
+
+    The step is a fixed fraction of the shortest orbital period among `items`,
+    so a selection of GEO objects is sampled far less densely than LEO debris.
+
+    """
+    k = Earth.k.to(u.km**3 / u.s**2).value
+    a = np.array([float(item["SEMIMAJOR_AXIS"]) for item in items])
+    if len(a) == 0:
+        step = MIN_STEP
+    else:
+        period = 2 * np.pi * np.sqrt(np.abs(a).min() ** 3 / k)
+        step = np.clip(period / SAMPLES_PER_ORBIT, MIN_STEP, MAX_STEP)
+    return max(2, int(np.ceil(prop_time * 60 / step)) + 1)
+
+
+def _angle(a, b):
+    cos = np.einsum('ij,ij->i', a, b) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return np.arccos(np.clip(cos, -1, 1))
+
+
+def refinement_resolution(observant_coords, observed_coords, body_axis, horizontal_FOV, vertical_FOV):
+    """Samples needed to resolve FOV transits within every coarse interval of one pair.
+
+    The line of sight to the observed object and the camera boresight both
+    turn between two coarse samples; their combined sweep is the relative
+    angular motion over the interval. Intervals that sweep more than
+    FOV_FRACTION of the FOV while passing close enough to the boresight to
+    cross it are refined with a step of FOV_FRACTION of the FOV.
+
+    Parameters
+    ----------
+    observant_coords, observed_coords : numpy.ndarray
+        Positions on the coarse grid (km), shape (N, 3).
+    body_axis : numpy.ndarray
+        Camera axes on the coarse grid, shape (N, 3, 3), boresight first.
+    horizontal_FOV, vertical_FOV : float
+        Camera fields of view (rad).
+
+    Returns
+    -------
+    resolution : numpy.ndarray
+        Integer array of shape (N,); entry i is the number of samples of the
+        interval ending at sample i, 0 when it needs no refinement.
+
+    """
+    los = np.asarray(observed_coords) - np.asarray(observant_coords)
+    boresight = np.asarray(body_axis)[:, 0, :]
+    off_axis = _angle(los, boresight)
+
+    sweep = _angle(los[:-1], los[1:]) + _angle(boresight[:-1], boresight[1:])
+    half_diagonal = np.arctan(np.hypot(np.tan(horizontal_FOV / 2), np.tan(vertical_FOV / 2)))
+    reachable = np.minimum(off_axis[:-1], off_axis[1:]) <= half_diagonal + sweep
+    fine_step = FOV_FRACTION * min(horizontal_FOV, vertical_FOV)
+
+    resolution = np.zeros(len(los), dtype=int)
+    refine = reachable & (sweep > fine_step)
+    resolution[1:][refine] = np.minimum(np.ceil(sweep[refine] / fine_step) + 1, MAX_REFINEMENT)
+    return resolution
+
+
+def _rotation_matrix(angle, axis):
+    axis = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+    K = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    return np.eye(3) + np.sin(angle) * K + (1 - np.cos(angle)) * K @ K
+
+
+def refined_crossings(ephem_observant, ephem_observed, epochs, resolution, angle_quat, axis_quat,
+                      horizontal_FOV, vertical_FOV, margin=0.0):
+    """Coarse intervals whose refined samples reach the FOV, tested on ephemerides.
+
+    Every interval with a nonzero `resolution` is resampled on the fine grid
+    of the refinement from both continuous ephemerides at once, the camera
+    frame is rebuilt as coord_frames.get_coord_sys does, and each fine
+    segment is tested against the FOV pyramid. Only the flagged intervals
+    need the sample by sample refinement of the encounter search.
+
+    Parameters
+    ----------
+    ephem_observant, ephem_observed : ContinuousEphemeris or ChebyshevEphemeris
+        Trajectories of the camera satellite and of the observed object.
+    epochs : astropy.time.Time
+        Coarse grid, shape (N,).
+    resolution : numpy.ndarray
+        Samples per interval, from refinement_resolution.
+    angle_quat : float
+        Camera rotation angle (deg) in the orbit frame.
+    axis_quat : list of float
+        Camera rotation axis in the orbit frame.
+    horizontal_FOV, vertical_FOV : float
+        Camera fields of view (rad).
+    margin : float
+        Position uncertainty (km) the FOV is widened by.
+
+    Returns
+    -------
+    crossing : numpy.ndarray
+        Boolean array of shape (N,); entry i flags the interval ending at sample i.
+
+    """
+    resolution = np.asarray(resolution, dtype=int)
+    crossing = np.zeros(len(resolution), dtype=bool)
+    intervals = np.flatnonzero(resolution > 0)
+    if len(intervals) == 0:
+        return crossing
+
+    #Fine grids of every refined interval, end to end
+    counts = resolution[intervals]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    owner = np.repeat(np.arange(len(intervals)), counts)
+    fraction = (np.arange(counts.sum()) - starts[owner]) / (counts[owner] - 1)
+
+    def fine_states(ephem):
+        tofs = ephem.tofs(epochs)
+        t0, t1 = tofs[intervals - 1], tofs[intervals]
+        return ephem.sample(t0[owner] + fraction * (t1 - t0)[owner])
+
+    rr_observant, vv_observant = fine_states(ephem_observant)
+    rr_observed, _ = fine_states(ephem_observed)
+
+    #Orbit frame of each interval from its second fine sample, body frame rotated from it
+    normal = np.cross(rr_observant[starts + 1], vv_observant[starts + 1])
+    y_axis = -(normal / np.linalg.norm(normal, axis=1)[:, None])[owner]
+    z_axis = -rr_observant / np.linalg.norm(rr_observant, axis=1)[:, None]
+    x_axis = np.cross(y_axis, z_axis)
+    relative = rr_observed - rr_observant
+    orbit_coords = np.column_stack([np.einsum('ij,ij->i', axis, relative) for axis in (x_axis, y_axis, z_axis)])
+    cam_coords = orbit_coords @ _rotation_matrix(np.radians(angle_quat), axis_quat)
+
+    #The FOV pyramid is four half-spaces, linear along a segment
+    tan_h, tan_v = np.tan(horizontal_FOV / 2), np.tan(vertical_FOV / 2)
+    x, y, z = cam_coords.T
+    bounds = np.stack([tan_h * (x + margin) + margin - y, tan_h * (x + margin) + margin + y,
+                       tan_v * (x + margin) + margin - z, tan_v * (x + margin) + margin + z])
+    segment = np.flatnonzero(owner[:-1] == owner[1:])
+    a, b = bounds[:, segment], bounds[:, segment + 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = a / (a - b)
+    lower = np.where(a < 0, root, 0).max(axis=0)
+    upper = np.where(b < 0, root, 1).min(axis=0)
+    inside = ~((a < 0) & (b < 0)).any(axis=0) & (lower <= upper)
+
+    crossing[intervals] = np.bincount(owner[segment], weights=inside, minlength=len(intervals)) > 0
+    return crossing
@@ -0,0 +1,155 @@
+import hashlib
+import mmap
+import os
+import pickle
+import sys
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+from astropy.time import Time
+
+
+### BOUNDED PROPAGATION STORE ###
+STORE_BUDGET_BYTES = 2 * 1024**3
+
+
+def entry_nbytes(obj, seen=None):
+    """Approximate memory (bytes) held by a store entry: arrays, ephemerides, lists and records.
+
+    Every array is counted once, through its base array: an item's
+    coordinates and the samples of its ephemeris share the same memory.
+    Memory-mapped arrays of the disk cache are not resident and count as 0.
+
+    """
+    seen = set() if seen is None else seen
+    if isinstance(obj, np.ndarray):
+        base = obj
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if isinstance(base, np.memmap) or isinstance(base.base, mmap.mmap) or id(base) in seen:
+            return 0
+        seen.add(id(base))
+        return base.nbytes
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(entry_nbytes(key, seen) + entry_nbytes(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(entry_nbytes(value, seen) for value in obj)
+    if isinstance(obj, Time):
+        return sys.getsizeof(obj) + 16 * obj.size #jd1 and jd2
+    #Ephemerides, compact trajectories and dense outputs: the arrays they hold
+    if hasattr(obj, '__dict__'):
+        return sys.getsizeof(obj) + sum(entry_nbytes(value, seen) for value in vars(obj).values())
+    return sys.getsizeof(obj)
+
+
+class PropagationStore:
+    """Propagations of the app by propagation_id, evicted least recently used beyond a byte budget.
+
+    Evicted entries are pickled to `spill_dir` when it is set and loaded back
+    on the next access. Hits, misses, evictions and spill reloads are
+    counted in `stats()`.
+
+    """
+
+    def __init__(self, budget_bytes=STORE_BUDGET_BYTES, spill_dir=None):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._spilled = set()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spill_loads = 0
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, hashlib.sha1(key.encode()).hexdigest() + ".pkl")
+
+    def _load(self, key):
+        if key not in self._spilled:
+            return None
+        try:
+            with open(self._spill_path(key), 'rb') as spill_file:
+                value = pickle.load(spill_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            self._spilled.discard(key)
+            return None
+        self.spill_loads += 1
+        self._insert(key, value)
+        return value
+
+    def _insert(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        self._sizes[key] = entry_nbytes(value)
+        self._spilled.discard(key)
+        #The newest entry always stays, even above the budget
+        while self.nbytes > self.budget_bytes and len(self._entries) > 1:
+            old_key, old_value = self._entries.popitem(last=False)
+            del self._sizes[old_key]
+            self.evictions += 1
+            if self.spill_dir is not None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                with open(self._spill_path(old_key), 'wb') as spill_file:
+                    pickle.dump(old_value, spill_file, protocol=pickle.HIGHEST_PROTOCOL)
+                self._spilled.add(old_key)
+
+    @property
+    def nbytes(self):
+        return sum(self._sizes.values())
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._insert(key, value)
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            value = self._load(key)
+            if value is None:
+                self.misses += 1
+                raise KeyError(key)
+            self.hits += 1
+            return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries or key in self._spilled
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def values(self):
+        """Entries held in memory, without touching their recency."""
+        with self._lock:
+            return list(self._entries.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "spilled": len(self._spilled),
+                "nbytes": self.nbytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "spill_loads": self.spill_loads,
+            }
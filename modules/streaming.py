@@ -0,0 +1,118 @@
+from astropy import units as u
+from poliastro.bodies import Earth
+
+import numpy as np
+
+from modules.propagation import (propagate_twobody_batch,
+                                 elements_to_states,
+                                 get_third_body_ephem,
+                                 to_julian,
+                                 screening_states,
+                                 TWOBODY_METHODS,
+                                 SECULAR_J2_METHOD
+                                 )
+from modules.cowell_batch import cowell_batch, COWELL_METHODS
+from modules.forces import ForceModel
+from modules.parallel import sgp4_propagator_parallel
+
+
+### STREAMING PROPAGATION ###
+CHUNK_MINUTES = 360
+
+
+def chunk_bounds(num_values, chunk_steps):
+    """(start, end) sample indices of consecutive chunks sharing their boundary sample."""
+    starts = list(range(0, max(num_values - 1, 1), max(chunk_steps - 1, 1)))
+    return [(start, min(start + chunk_steps, num_values)) for start in starts]
+
+
+def propagate_chunks(items, epochs, method, chunk_steps, force_models=None):
+    """Propagate catalog objects window by window over `epochs`.
+
+    Every chunk holds `chunk_steps` epochs and starts on the last epoch of the
+    previous one, so intervals across chunk boundaries are not lost. Only one
+    chunk of states is alive at a time; Cowell integrations restart each
+    chunk from the last state of the previous one.
+
+    Parameters
+    ----------
+    items : list of dict
+        Catalog records of the objects, as in the app.
+    epochs : astropy.time.Time
+        Full epoch grid.
+    method : str
+        Propagator, as selected in the app.
+    chunk_steps : int
+        Epochs per chunk.
+    force_models : list of forces.ForceModel, optional
+        Force model of every object for the Cowell methods.
+
+    Yields
+    ------
+    offset : int
+        Index in `epochs` of the first epoch of the chunk.
+    epochs_chunk : astropy.time.Time
+        Epochs of the chunk.
+    rr, vv : numpy.ndarray
+        Positions (km) and velocities (km/s), shape (N_items, N_chunk, 3).
+
+    """
+    start_date = epochs[0]
+    t_grid = (epochs - start_date).to(u.s).value
+    k = Earth.k.to(u.km**3 / u.s**2).value
+
+    sgp4 = np.array([method == 'SGP4' and item['OBJECT_ID'] != 'CREATED BY USER' for item in items], dtype=bool)
+    sgp4_items = [item for item, is_sgp4 in zip(items, sgp4) if is_sgp4]
+    orbit_items = [item for item, is_sgp4 in zip(items, sgp4) if not is_sgp4]
+    batch_method = 'Farnocchia' if method == 'SGP4' else method
+
+    r0, v0, t_epoch = elements_to_states(orbit_items, start_date)
+    t_window_start = min([0.0] + list(t_epoch))
+
+    if batch_method in COWELL_METHODS:
+        A_over_m = np.array([float(item['span'])**2/float(item['mass']) for item in orbit_items])
+        if force_models is None:
+            force_models = [ForceModel(COWELL_METHODS[batch_method])] * len(orbit_items)
+        else:
+            force_models = [model for model, is_sgp4 in zip(force_models, sgp4) if not is_sgp4]
+        needs_ephem = any(model.needs_ephem for model in force_models)
+        ephem = get_third_body_ephem(start_date + t_window_start * u.s, epochs[-1]) if needs_ephem else None
+
+    for start, end in chunk_bounds(len(epochs), chunk_steps):
+        epochs_chunk = epochs[start:end]
+        t_chunk = t_grid[start:end]
+        rr = np.empty((len(items), end - start, 3))
+        vv = np.empty((len(items), end - start, 3))
+
+        if sgp4_items:
+            jd, fr = to_julian(epochs_chunk)
+            rr_sgp4, vv_sgp4, errors = sgp4_propagator_parallel(jd, fr, sgp4_items)
+            rr_sgp4[errors] = np.nan
+            rr[sgp4], vv[sgp4] = rr_sgp4, vv_sgp4
+
+        if orbit_items:
+            if batch_method in TWOBODY_METHODS:
+                rv = propagate_twobody_batch(k, r0, v0, t_chunk[None, :] - t_epoch[:, None], method=batch_method)
+            elif batch_method == SECULAR_J2_METHOD:
+                rv = screening_states(orbit_items, start_date, t_chunk)
+            else:
+                #Each chunk continues from the last state of the previous one
+                rv = cowell_batch(k, r0, v0, t_chunk[None, :] - t_epoch[:, None], method=batch_method,
+                                  A_over_m=A_over_m, ephem=ephem, t_offsets=t_epoch - t_window_start,
+                                  force_models=force_models)[0]
+                r0, v0 = rv[:, -1, :3].copy(), rv[:, -1, 3:].copy()
+                t_epoch = np.full(len(orbit_items), t_chunk[-1])
+            rr[~sgp4], vv[~sgp4] = rv[:, :, :3], rv[:, :, 3:]
+
+        yield start, epochs_chunk, rr, vv
+
+
+def ephemeris_chunks(ephemerides, norad_ids, epochs, chunk_steps):
+    """Resample stored ephemerides window by window, in the format of propagate_chunks."""
+    for start, end in chunk_bounds(len(epochs), chunk_steps):
+        epochs_chunk = epochs[start:end]
+        rr = np.empty((len(norad_ids), end - start, 3))
+        vv = np.empty((len(norad_ids), end - start, 3))
+        for i, norad_id in enumerate(norad_ids):
+            rr[i], vv[i] = ephemerides[norad_id].sample_epochs(epochs_chunk)
+        yield start, epochs_chunk, rr, vv
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from astropy.time import Time
+
+from modules.chebyshev import ChebyshevEphemeris
+
+
+MU_EARTH = 398600.4418 #km3/s2
+EPOCH = Time('2024-09-09 10:00:00.000', scale='utc')
+
+
+def circular_states(t, radius=7000.0):
+    w = np.sqrt(MU_EARTH / radius**3)
+    rr = radius * np.column_stack((np.cos(w * t), np.sin(w * t), np.zeros_like(t)))
+    vv = radius * w * np.column_stack((-np.sin(w * t), np.cos(w * t), np.zeros_like(t)))
+    return rr, vv
+
+
+@pytest.mark.parametrize("with_velocity", [True, False])
+def test_failed_samples_split_the_fit(with_velocity):
+    t = np.arange(0, 7201, 60.0)
+    rr, vv = circular_states(t)
+    #Leading, isolated, consecutive and trailing failures
+    failed = [0, 30, 70, 71, 72, len(t) - 1]
+    rr[failed] = np.nan
+    fit = ChebyshevEphemeris.fit(EPOCH, t, rr, vv if with_velocity else None, tol=1e-3)
+
+    rr_fit, _ = fit.sample(t)
+    finite = np.isfinite(rr).all(axis=1)
+    assert np.isnan(rr_fit[failed]).all()
+    assert np.abs(rr_fit[finite] - rr[finite]).max() <= 1e-3
+    #Between a finite sample and a failed one, halfway from the finite side is still fitted
+    assert np.isfinite(fit.sample(t[29] + 20)[0]).all()
+    assert np.isnan(fit.sample(t[29] + 40)[0]).all()
+
+
+def test_tolerance_met_across_a_jump():
+    t = np.arange(0, 3601, 60.0)
+    rr, vv = circular_states(t)
+    #A 1 km jump the velocities do not follow, as across a change of TLE
+    rr[t >= 1800] += 1.0
+    fit = ChebyshevEphemeris.fit(EPOCH, t, rr, vv, tol=1e-3)
+
+    assert np.abs(fit.sample(t)[0] - rr).max() <= 1e-3
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from modules.compact import CompactTrajectory, ANCHOR_BLOCK
+
+
+MU_EARTH = 398600.4418 #km3/s2
+
+
+def circular_orbit(radius, n_samples=14400, step=6.0, inclination=0.9):
+    """Positions (km) on a circular orbit, sampled on the 6 s grid of the app."""
+    t = np.arange(n_samples) * step
+    angle = np.sqrt(MU_EARTH / radius**3) * t
+    return radius * np.column_stack((np.cos(angle),
+                                     np.sin(angle) * np.cos(inclination),
+                                     np.sin(angle) * np.sin(inclination)))
+
+
+@pytest.mark.parametrize("radius", [7000.0, 42164.0], ids=["LEO", "GEO"])
+def test_decode_within_error_bound(radius):
+    rr = circular_orbit(radius)
+    compact = CompactTrajectory.encode(rr)
+
+    error = np.abs(compact.decode() - rr).max()
+    assert compact.decode().dtype == np.float64
+    assert compact.error_bound > 0
+    assert error <= compact.error_bound
+    assert compact.nbytes < rr.nbytes
+
+
+def test_nan_samples_carry_no_bound():
+    rr = circular_orbit(7000.0, n_samples=1000)
+    #A failed sample in the middle of a block, where its anchor is taken, and one elsewhere
+    failed = [ANCHOR_BLOCK // 2, 3 * ANCHOR_BLOCK + 5]
+    rr[failed] = np.nan
+    compact = CompactTrajectory.encode(rr)
+    decoded = compact.decode()
+
+    finite = np.isfinite(rr).all(axis=1)
+    assert np.isnan(decoded[failed]).all()
+    assert np.isfinite(decoded[finite]).all()
+    assert np.isfinite(compact.error_bound)
+    assert np.abs(decoded[finite] - rr[finite]).max() <= compact.error_bound
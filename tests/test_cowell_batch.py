@@ -0,0 +1,62 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from modules.cowell_batch import cowell_batch
+from modules.forces import func_twobody_w_s_pert_fast, func_twobody_w_pert_fast
+from modules.propagation import propagate_twobody_batch
+
+
+MU_EARTH = 398600.4418 #km3/s2
+A_OVER_M = 1e-8 #km2/kg
+
+
+def leo_states():
+    #Circular, eccentric and retrograde low orbits
+    r0 = np.array([[6778.0, 0.0, 0.0], [0.0, 7200.0, 0.0], [4000.0, 0.0, 5500.0]])
+    v0 = np.array([[0.0, 5.2, 5.2], [-7.9, 0.0, 1.0], [0.0, -7.3, 0.0]])
+    return r0, v0
+
+
+def test_unperturbed_matches_twobody():
+    r0, v0 = leo_states()
+    tofs = np.linspace(-3600, 86400, 97)
+    rv, success = cowell_batch(MU_EARTH, r0, v0, tofs)
+
+    assert success.all()
+    assert np.abs(rv - propagate_twobody_batch(MU_EARTH, r0, v0, tofs)).max() < 1e-3
+
+
+def test_j2_drag_matches_dop853():
+    r0, v0 = leo_states()
+    tofs = np.linspace(0, 6 * 3600, 37)
+    rv, success = cowell_batch(MU_EARTH, r0, v0, tofs, method='Cowell (w/ some perturbations)',
+                               A_over_m=np.full(3, A_OVER_M))
+
+    assert success.all()
+    for i in range(3):
+        reference = solve_ivp(func_twobody_w_s_pert_fast, (0, tofs[-1]), np.hstack((r0[i], v0[i])),
+                              args=(MU_EARTH, A_OVER_M), method='DOP853', rtol=1e-12, atol=1e-12, t_eval=tofs)
+        assert np.abs(rv[i] - reference.y.T)[:, :3].max() < 1e-3
+
+
+def circular_nodes(radius, period, t, phase):
+    angle = 2 * np.pi * t / period + phase
+    return np.ascontiguousarray(radius * np.column_stack((np.cos(angle), np.sin(angle) * 0.92, np.sin(angle) * 0.4)))
+
+
+def test_full_perturbations_match_dop853():
+    r0, v0 = leo_states()
+    tofs = np.linspace(0, 6 * 3600, 37)
+    #Moon and Sun on circular orbits, in the format of propagation.get_third_body_ephem
+    t_nodes = np.arange(-3600, 6 * 3600 + 3601, 600.0)
+    ephem = (t_nodes[0], 600.0, circular_nodes(384400.0, 27.32 * 86400, t_nodes, 1.0),
+             circular_nodes(1.496e8, 365.25 * 86400, t_nodes, 4.0))
+    rv, success = cowell_batch(MU_EARTH, r0, v0, tofs, method='Cowell (w/ perturbations)',
+                               A_over_m=np.full(3, A_OVER_M), ephem=ephem)
+
+    assert success.all()
+    for i in range(3):
+        #The right-hand side of modules.cowell_propagator.cowell
+        reference = solve_ivp(func_twobody_w_pert_fast, (0, tofs[-1]), np.hstack((r0[i], v0[i])),
+                              args=(MU_EARTH, A_OVER_M, ephem), method='DOP853', rtol=1e-12, atol=1e-12, t_eval=tofs)
+        assert np.abs(rv[i] - reference.y.T)[:, :3].max() < 1e-3
@@ -0,0 +1,48 @@
+import numpy as np
+
+from modules.data import mean_to_true_anomaly
+
+
+def scalar_true_anomaly(M, e, tol=1e-10):
+    """The per-record Newton-Raphson loop the catalog ingest used before."""
+    E = M if e < 0.8 else np.pi
+    while True:
+        f = E - e * np.sin(E) - M
+        E_next = E - f / (1 - e * np.cos(E))
+        if abs(E_next - E) < tol:
+            break
+        E = E_next
+    nu = 2 * np.arctan2(np.sqrt(1 + e) * np.sin(E / 2), np.sqrt(1 - e) * np.cos(E / 2))
+    if nu < 0:
+        nu += 2 * np.pi
+    return np.degrees(nu)
+
+
+def test_matches_scalar_loop():
+    rng = np.random.default_rng(0)
+    M = rng.uniform(0, 2 * np.pi, 2000)
+    e = np.concatenate((rng.uniform(0, 0.99, 1990), [0.0, 0.5, 0.79, 0.8, 0.81, 0.95, 0.99, 0.999, 0.0, 0.9]))
+    M[-2:] = 0.0
+
+    nu, converged = mean_to_true_anomaly(M, e)
+
+    assert converged.all()
+    expected = np.array([scalar_true_anomaly(M_i, e_i) for M_i, e_i in zip(M, e)])
+    #Angles near 0 and 360 deg are the same
+    difference = np.abs(nu - expected)
+    assert np.minimum(difference, 360 - difference).max() < 1e-6
+    assert np.all((nu >= 0) & (nu < 360))
+
+    #Mean anomalies of other revolutions give the same true anomaly
+    nu_wrapped, converged = mean_to_true_anomaly(M + 2 * np.pi * rng.integers(-2, 3, len(M)), e)
+    assert converged.all()
+    difference = np.abs(nu_wrapped - nu)
+    assert np.minimum(difference, 360 - difference).max() < 1e-6
+
+
+def test_open_orbits_are_flagged():
+    nu, converged = mean_to_true_anomaly(np.array([1.0, 1.0, 2.0, 0.5]), np.array([0.1, 1.0, 1.5, 0.99]))
+
+    assert np.isnan(nu[1:3]).all()
+    assert converged.tolist() == [True, False, False, True]
+    assert np.isfinite(nu[[0, 3]]).all()
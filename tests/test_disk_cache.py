@@ -0,0 +1,27 @@
+import os
+
+import numpy as np
+
+from modules import disk_cache
+
+
+def test_prune_deletes_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, "CACHE_DIR", str(tmp_path))
+    keys = ["aa01", "bb02", "cc03"]
+    for age, key in enumerate(keys):
+        disk_cache.save_trajectory(key, np.zeros((100, 6)))
+        #Oldest first, one minute apart
+        os.utime(disk_cache._path(key), (1e9 + 60 * age, 1e9 + 60 * age))
+    size = os.path.getsize(disk_cache._path(keys[0]))
+
+    #A cache hit makes the oldest file the most recently used
+    assert disk_cache.load_trajectory(keys[0]) is not None
+
+    assert disk_cache.prune_cache(2 * size) == size
+    assert disk_cache.load_trajectory(keys[1]) is None
+    assert disk_cache.load_trajectory(keys[0]) is not None
+    assert disk_cache.load_trajectory(keys[2]) is not None
+
+    assert disk_cache.prune_cache(2 * size) == 0
+    assert disk_cache.prune_cache(0) == 2 * size
+    assert not any(name.endswith(".npy") for _, _, names in os.walk(tmp_path) for name in names)
@@ -0,0 +1,66 @@
+import numpy as np
+from astropy import units as u
+from astropy.time import Time
+from poliastro.bodies import Earth
+
+from modules.eclipse import eclipse_timeline, ILLUMINATED, UMBRA
+from modules.sun import sun_position_teme
+
+
+MU_EARTH = 398600.4418 #km3/s2
+R_EARTH = Earth.R.to(u.km).value
+
+
+def orbits(t):
+    """LEO, MEO and GEO circular orbits at several inclinations, shape (M, N, 3)."""
+    rr = []
+    for radius, inclination in [(6778.0, 0.9), (7200.0, 1.7), (12000.0, 0.3), (42164.0, 0.0)]:
+        angle = np.sqrt(MU_EARTH / radius**3) * t
+        rr.append(radius * np.column_stack((np.cos(angle), np.sin(angle) * np.cos(inclination),
+                                            np.sin(angle) * np.sin(inclination))))
+    return np.array(rr)
+
+
+def step_shadow(observed_coords, sun_coords):
+    """The per-step check of get_observable_objects before the timelines, True in shadow."""
+    shadow = []
+    for index in range(len(observed_coords)):
+        r_sun_observed = (observed_coords[index] - sun_coords[index]) * 1000
+        r_sun_observed_norm = np.linalg.norm(r_sun_observed)
+        r_sun_Earth = -(sun_coords[index]) * 1000
+        r_sun_Earth_norm = np.linalg.norm(r_sun_Earth)
+        angle_gamma = np.arccos(np.dot(r_sun_observed / r_sun_observed_norm, r_sun_Earth / r_sun_Earth_norm))
+        h = np.sin(angle_gamma) * r_sun_observed_norm
+        b = np.dot(r_sun_observed, r_sun_Earth / r_sun_Earth_norm)
+        shadow.append(not (h >= float(Earth.R.value) or (h < float(Earth.R.value) and b < r_sun_Earth_norm)))
+    return np.array(shadow)
+
+
+def test_cylindrical_matches_step_check():
+    t = np.arange(0, 86400, 30.0)
+    sun = sun_position_teme(Time('2024-09-09 10:00:00.000', scale='utc') + t * u.s)
+    rr = orbits(t)
+    timeline = eclipse_timeline(rr, sun, model='cylindrical')
+
+    for i in range(len(rr)):
+        assert np.array_equal(timeline[i], eclipse_timeline(rr[i], sun, model='cylindrical'))
+        #The arccos of the step check loses about a kilometre at the shadow edge
+        sun_hat = sun / np.linalg.norm(sun, axis=1)[:, None]
+        across = np.linalg.norm(rr[i] - np.einsum('ij,ij->i', rr[i], sun_hat)[:, None] * sun_hat, axis=1)
+        edge = np.abs(across - R_EARTH) < 5
+        assert np.array_equal((timeline[i] == UMBRA)[~edge], step_shadow(rr[i], sun)[~edge])
+    assert (timeline[:3] == UMBRA).any(axis=1).all()
+
+
+def test_conical_brackets_cylindrical():
+    t = np.arange(0, 86400, 30.0)
+    sun = sun_position_teme(Time('2024-03-20 10:00:00.000', scale='utc') + t * u.s)
+    rr = orbits(t)
+    cylindrical = eclipse_timeline(rr, sun, model='cylindrical')
+    conical = eclipse_timeline(rr, sun, model='conical')
+
+    #The umbra cone narrows inside the Earth's cylinder and the penumbra widens out of it
+    assert np.all(cylindrical[conical == UMBRA] == UMBRA)
+    assert np.all(conical[cylindrical == UMBRA] != ILLUMINATED)
+    #Equinox: GEO crosses the shadow too
+    assert (conical[3] == UMBRA).any()
@@ -0,0 +1,30 @@
+import numpy as np
+from astropy import units as u
+from astropy.time import Time
+from sgp4.api import jday
+
+from modules.propagation import julian_range, to_julian
+
+
+def test_julian_range_matches_jday():
+    #6 s steps over two midnights
+    start = Time('2024-09-09 23:50:00.000', scale='utc')
+    step, num_values = 6.0, 14401
+    jd, fr = julian_range(start, step, num_values)
+
+    epochs = (start + np.arange(num_values) * step * u.s).utc.datetime
+    expected = np.array([jday(epoch.year, epoch.month, epoch.day, epoch.hour, epoch.minute,
+                              epoch.second + epoch.microsecond * 1e-6) for epoch in epochs])
+
+    assert np.array_equal(jd, expected[:, 0])
+    assert np.all((fr >= 0) & (fr < 1))
+    assert np.abs(fr - expected[:, 1]).max() * 86400 < 1e-6
+
+
+def test_julian_range_matches_time_grid():
+    start = Time('2024-09-09 10:00:00.000', scale='utc')
+    epochs = start + np.linspace(0, 1800, 30001) * u.s
+    jd, fr = julian_range(start, 1800 / 30000 * u.s, 30001)
+    jd_grid, fr_grid = to_julian(epochs)
+
+    assert np.abs((jd - jd_grid) + (fr - fr_grid)).max() * 86400 < 1e-6
@@ -0,0 +1,59 @@
+import numpy as np
+from astropy import units as u
+from astropy.time import Time
+
+from modules.coord_frames import get_coord_sys
+from modules.ephemeris import ContinuousEphemeris
+from modules.observability import check_line_intersects_fov
+from modules.sampling import refinement_resolution, refined_crossings
+
+
+MU_EARTH = 398600.4418 #km3/s2
+START = Time('2024-09-09 10:00:00.000', scale='utc')
+FOV_H, FOV_V = np.radians(3.5), np.radians(2.0)
+ANGLE, AXIS = 20.0, [0.0, 0.0, 1.0]
+
+
+def circular_ephemeris(radius, inclination, raan, phase, t):
+    w = np.sqrt(MU_EARTH / radius**3)
+    node = np.array([np.cos(raan), np.sin(raan), 0.0])
+    normal = np.array([np.sin(raan) * np.sin(inclination), -np.cos(raan) * np.sin(inclination), np.cos(inclination)])
+    along = np.cross(normal, node)
+    angle = (w * t + phase)[:, None]
+    rr = radius * (np.cos(angle) * node + np.sin(angle) * along)
+    vv = radius * w * (-np.sin(angle) * node + np.cos(angle) * along)
+    return ContinuousEphemeris.from_samples(START, t, rr, vv)
+
+
+def test_refined_crossings_cover_scalar_refinement():
+    t_dense = np.arange(0, 6001, 2.0)
+    observant = circular_ephemeris(7000.0, 0.9, 0.2, 0.0, t_dense)
+    observed = [circular_ephemeris(7000.0 + 20 * i, 0.9 + 0.4 * i, 0.2 + 0.01 * i, 0.05 * i, t_dense)
+                for i in range(1, 6)]
+
+    t = np.arange(0, 6001, 30.0)
+    epochs = START + t * u.s
+    rr_observant, vv_observant = observant.sample(t)
+    _, body_axis = get_coord_sys(rr_observant, vv_observant, ANGLE, AXIS)
+
+    flagged = 0
+    for ephem in observed:
+        resolution = refinement_resolution(rr_observant, ephem.sample(t)[0], body_axis, FOV_H, FOV_V)
+        crossing = refined_crossings(observant, ephem, epochs, resolution, ANGLE, AXIS, FOV_H, FOV_V)
+        assert not crossing[resolution == 0].any()
+
+        #Fine samples of every refined interval, tested one by one as the encounter search does
+        for index in np.flatnonzero(resolution):
+            t_fine = np.linspace(t[index - 1], t[index], resolution[index])
+            rr_fine, vv_fine = observant.sample(t_fine)
+            _, body_fine = get_coord_sys(rr_fine, vv_fine, ANGLE, AXIS)
+            pos_cam = np.einsum('nij,nj->ni', body_fine, (ephem.sample(t_fine)[0] - rr_fine) * 1000)
+            in_fov = ((np.abs(pos_cam[:, 1]) <= pos_cam[:, 0] * np.tan(FOV_H / 2)) &
+                      (np.abs(pos_cam[:, 2]) <= pos_cam[:, 0] * np.tan(FOV_V / 2)))
+            hit = in_fov.any() or any(check_line_intersects_fov(FOV_V, FOV_H, pos_cam[i - 1], pos_cam[i])
+                                      for i in range(1, len(t_fine)))
+            if hit:
+                flagged += 1
+                assert crossing[index]
+
+    assert flagged > 0
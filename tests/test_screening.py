@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.time import Time
+from poliastro.core.angles import E_to_nu, M_to_E
+from sgp4.api import Satrec, WGS72
+from sgp4.exporter import export_tle
+
+from modules.observability import SCREENING_POSITION_ERROR
+from modules.parallel import sgp4_propagator_parallel
+from modules.propagation import screening_states, to_julian
+
+
+MU_EARTH = 398600.4418 #km3/s2
+
+
+def leo_catalog(n, bstar, epoch, seed=0):
+    """LEO records between 300 and 900 km whose catalog columns and TLEs describe the same mean orbit."""
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(n):
+        a = 6378.137 + rng.uniform(300, 900)
+        ecc = rng.uniform(1e-4, 1e-2)
+        inc, raan, argp, M = np.radians(rng.uniform([40, 0, 0, 0], [100, 360, 360, 360]))
+        satrec = Satrec()
+        satrec.sgp4init(WGS72, 'i', 90000 + i, epoch.jd - 2433281.5, bstar, 0.0, 0.0, ecc, argp, inc, M,
+                        np.sqrt(MU_EARTH / a**3) * 60, raan)
+        line1, line2 = export_tle(satrec)
+        items.append({
+            "NORAD_CAT_ID": 90000 + i,
+            "OBJECT_ID": "SCREENING TEST",
+            "EPOCH": epoch.isot,
+            "SEMIMAJOR_AXIS": a,
+            "ECCENTRICITY": ecc,
+            "INCLINATION": np.degrees(inc),
+            "RA_OF_ASC_NODE": np.degrees(raan),
+            "ARG_OF_PERICENTER": np.degrees(argp),
+            "TRUE_ANOMALY": np.degrees(E_to_nu(M_to_E(M, ecc), ecc)),
+            "TLE_LINE1": line1,
+            "TLE_LINE2": line2,
+        })
+    return items
+
+
+@pytest.mark.parametrize("bstar", [0.0, 1e-5, 1e-4, 5e-4])
+def test_screening_states_within_margin_of_sgp4(bstar):
+    #TLEs 3 days old, screened over the next day
+    start = Time('2024-09-09 00:00:00', scale='utc')
+    items = leo_catalog(100, bstar, start - 3 * u.day)
+    t_grid = np.arange(0, 86400 + 1, 120.0)
+    jd, fr = to_julian(start + t_grid * u.s)
+
+    rr_sgp4, _, errors = sgp4_propagator_parallel(jd, fr, items)
+    states = screening_states(items, start, t_grid)
+
+    error = np.linalg.norm(states[:, :, :3] - rr_sgp4, axis=-1)[~errors]
+    assert error.max() < SCREENING_POSITION_ERROR
@@ -0,0 +1,75 @@
+import numpy as np
+from astropy import units as u
+from astropy.time import Time
+
+from modules.ephemeris import ContinuousEphemeris
+from modules.store import PropagationStore, entry_nbytes
+
+
+MB = 1024**2
+START = Time('2024-09-09 10:00:00.000', scale='utc')
+
+
+def propagation(n_samples=10000, value=0.0):
+    """An entry shaped as the app stores it: records whose coordinates back their ephemerides."""
+    t = np.arange(n_samples) * 6.0
+    rr = np.full((n_samples, 3), value)
+    vv = np.zeros((n_samples, 3))
+    return {
+        "trajectory_data": [{"NORAD_CAT_ID": 1, "coords": rr[:, :]}],
+        "ephemerides": {1: ContinuousEphemeris.from_samples(START, t, rr, vv)},
+        "t_grid": t,
+    }
+
+
+def test_entry_nbytes_counts_shared_arrays_once(tmp_path):
+    entry = propagation()
+    #rr and vv once, though rr backs the coordinates too, and t shared with t_grid
+    arrays = 2 * 10000 * 3 * 8 + 10000 * 8
+    assert arrays <= entry_nbytes(entry) < arrays + 0.01 * MB
+
+    epochs = START + np.arange(1000) * 60 * u.s
+    assert entry_nbytes(epochs) >= 16 * 1000
+    assert entry_nbytes(START) > 0
+
+    path = tmp_path / "states.npy"
+    np.save(path, np.zeros((10000, 6)))
+    assert entry_nbytes({"coords": np.load(path, mmap_mode='r')}) < 0.01 * MB
+
+
+def test_least_recently_used_are_evicted():
+    size = entry_nbytes(propagation())
+    store = PropagationStore(budget_bytes=2.5 * size)
+    store["a"] = propagation()
+    store["b"] = propagation()
+    assert store["a"] is not None
+    store["c"] = propagation()
+
+    assert "b" not in store
+    assert "a" in store and "c" in store
+    assert store.stats()["evictions"] == 1
+    assert store.nbytes == 2 * size
+    assert store.get("b") is None
+    assert store.stats()["misses"] == 1
+
+    #The newest entry stays even above the budget
+    store["big"] = propagation(n_samples=40000)
+    assert len(store) == 1 and "big" in store
+
+
+def test_evicted_entries_are_spilled_and_reloaded(tmp_path):
+    size = entry_nbytes(propagation())
+    store = PropagationStore(budget_bytes=1.5 * size, spill_dir=str(tmp_path))
+    store["a"] = propagation(value=1.0)
+    store["b"] = propagation(value=2.0)
+
+    assert len(store) == 1 and "a" in store
+    assert store.stats()["spilled"] == 1
+
+    entry = store["a"]
+    assert store.stats()["spill_loads"] == 1
+    assert np.array_equal(entry["trajectory_data"][0]["coords"], np.full((10000, 3), 1.0))
+    assert np.array_equal(entry["ephemerides"][1].sample([60.0])[0], [[1.0, 1.0, 1.0]])
+    #Reloading pushed the other entry out
+    assert len(store) == 1 and "b" in store
+    assert store["b"]["trajectory_data"][0]["coords"][0, 0] == 2.0
@@ -0,0 +1,58 @@
+import numpy as np
+from astropy import units as u
+from astropy.time import Time
+
+from modules.coord_frames import get_coord_sys
+from modules.ephemeris import ContinuousEphemeris
+from modules.observability import get_observable_objects, get_sun_data, stream_observable_objects
+from modules.streaming import ephemeris_chunks
+
+
+MU_EARTH = 398600.4418 #km3/s2
+START = Time('2024-09-09 10:00:00.000', scale='utc')
+CAMERA = {'f-number': 2.8, 'Sensor Width': 6.2208, 'Sensor Height': 3.4992, 'Camera Resolution': 0.9216,
+          'Focal Length': 100, 'Quaternion Angle': 20.0, 'Quaternion Vector': '[0.0, 0.0, 1.0]'}
+
+
+def circular_states(radius, inclination, raan, phase, t):
+    w = np.sqrt(MU_EARTH / radius**3)
+    node = np.array([np.cos(raan), np.sin(raan), 0.0])
+    normal = np.array([np.sin(raan) * np.sin(inclination), -np.cos(raan) * np.sin(inclination), np.cos(inclination)])
+    along = np.cross(normal, node)
+    angle = (w * t + phase)[:, None]
+    return (radius * (np.cos(angle) * node + np.sin(angle) * along),
+            radius * w * (-np.sin(angle) * node + np.cos(angle) * along))
+
+
+def test_streaming_matches_full_grid_adaptive():
+    items = [dict(CAMERA, OBJECT_NAME='Event-Sat-1', OBJECT_ID='CREATED BY USER', NORAD_CAT_ID='C1')]
+    orbits = [(7000.0, 0.9, 0.2, 0.0)]
+    for i in range(1, 9):
+        items.append(dict(OBJECT_NAME=f'D{i}', OBJECT_ID=f'2000-{i}', NORAD_CAT_ID=1000 + i, length=5.0, diameter=3.0))
+        orbits.append((7000.0 + 20 * i, 0.9 + 0.2 * i, 0.2 + 0.01 * i, 0.05 * i))
+
+    #Coarse adaptive grid, the continuous ephemerides are Hermite fits of it as in the app
+    t = np.arange(0, 6001, 30.0)
+    epochs = START + t * u.s
+    states = [circular_states(*orbit, t) for orbit in orbits]
+    ephemerides = {item['NORAD_CAT_ID']: ContinuousEphemeris.from_samples(START, t, rr, vv)
+                   for item, (rr, vv) in zip(items, states)}
+
+    _, body_axis = get_coord_sys(states[0][0], states[0][1], CAMERA['Quaternion Angle'], [0.0, 0.0, 1.0])
+    created_data = dict(items[0], coords=states[0][0], bodyaxis=body_axis)
+    catalog_data = [dict(item, coords=rr) for item, (rr, _) in zip(items[1:], states[1:])]
+    expected, _ = get_observable_objects(created_data, catalog_data, get_sun_data(epochs), ephemerides, adaptive=True)
+
+    chunks = ephemeris_chunks(ephemerides, [item['NORAD_CAT_ID'] for item in items], epochs, 50)
+    _, observations = stream_observable_objects(chunks, items, adaptive=True)
+    streamed = {observation['NORAD_CAT_ID_observed']: observation for observation in observations[0]['observations']}
+
+    assert len(expected) > 0
+    assert sorted(streamed) == sorted(observation['NORAD_CAT_ID_observed'] for observation in expected)
+    for observation in expected:
+        other = streamed[observation['NORAD_CAT_ID_observed']]
+        assert other['Index_observable'] == observation['Index_observable']
+        assert other['Time of Closest Approach'] == observation['Time of Closest Approach']
+        assert np.isclose(other['Closest Distance (km)'], observation['Closest Distance (km)'])
+    #Encounters between coarse samples are only found by the adaptive refinement
+    assert any(observation['Time of Closest Approach'] not in epochs.utc.iso for observation in expected)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from poliastro.core.elements import coe2rv
+from poliastro.core.propagation import pimienta
+from poliastro.core.propagation.farnocchia import farnocchia_rv
+
+from modules.propagation import propagate_twobody_batch
+
+
+MU_EARTH = 398600.4418 #km3/s2
+
+
+def random_orbits(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ecc = np.concatenate((rng.uniform(0, 0.8, n - 2), [0.0, 1.5]))
+    p = rng.uniform(6800, 42164, n) * np.where(ecc < 1, 1 - ecc**2, ecc**2 - 1)
+    inc, raan, argp = rng.uniform(0, np.pi, n), rng.uniform(0, 2 * np.pi, n), rng.uniform(0, 2 * np.pi, n)
+    nu = np.where(ecc < 1, rng.uniform(-np.pi, np.pi, n), rng.uniform(-1, 1, n))
+    states = [coe2rv(MU_EARTH, *coe) for coe in zip(p, ecc, inc, raan, argp, nu)]
+    return ecc, np.array([r for r, _ in states]), np.array([v for _, v in states])
+
+
+def assert_matches(rv, r0, v0, tofs, orbits, reference, tol):
+    for i in orbits:
+        for j, tof in enumerate(tofs):
+            r, v = reference(MU_EARTH, r0[i], v0[i], tof)
+            assert np.allclose(rv[i, j, :3], r, rtol=0, atol=tol * np.linalg.norm(r))
+            assert np.allclose(rv[i, j, 3:], v, rtol=0, atol=tol * np.linalg.norm(v))
+
+
+@pytest.mark.parametrize("method", ['Farnocchia', 'Danby', 'Vallado'])
+def test_batch_matches_farnocchia(method):
+    ecc, r0, v0 = random_orbits(12)
+    tofs = np.linspace(-3600, 86400, 25)
+    rv = propagate_twobody_batch(MU_EARTH, r0, v0, tofs, method=method)
+
+    #Danby's solver only converges on closed orbits
+    orbits = np.flatnonzero(ecc < 1) if method == 'Danby' else range(len(ecc))
+    assert_matches(rv, r0, v0, tofs, orbits, farnocchia_rv, 1e-6)
+
+
+def test_batch_matches_pimienta():
+    #Pimienta's series is not accurate over these times of flight, the batch follows poliastro's solver
+    ecc, r0, v0 = random_orbits(12)
+    tofs = np.linspace(-3600, 86400, 25)
+    rv = propagate_twobody_batch(MU_EARTH, r0, v0, tofs, method='Pimienta')
+
+    assert_matches(rv, r0, v0, tofs, np.flatnonzero(ecc < 1), pimienta, 1e-9)
+
+
+def test_batch_per_orbit_grids():
+    _, r0, v0 = random_orbits(5, seed=1)
+    tofs = np.linspace(0, 7200, 30)[None, :] + np.arange(5)[:, None] * 600.0
+    rv = propagate_twobody_batch(MU_EARTH, r0, v0, tofs)
+
+    for i in range(5):
+        assert np.array_equal(rv[i], propagate_twobody_batch(MU_EARTH, r0[i:i + 1], v0[i:i + 1], tofs[i])[0])